@@ -0,0 +1,315 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views import View
+from django.views.decorators.gzip import gzip_page
+
+from ads.forms import AdForm, ExchangeProposalForm
+from ads.models import Ad, ExchangeProposal
+from ads.paginators import CursorPaginator
+from ads.search import get_search_backend
+from ads.services import TransitionResult
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.extra = extra
+
+
+class ApiField:
+    """Поле ответа: колонки, которые нужно выбрать из БД, и способ получить значение."""
+
+    def __init__(self, getter, *columns):
+        self.getter = getter
+        self.columns = columns
+
+
+def attribute(name, column=None):
+    return ApiField(lambda obj: getattr(obj, name), column or name)
+
+
+def image_url(obj):
+    return obj.image_url.url if obj.image_url else None
+
+
+AD_FIELDS = {
+    "id": attribute("id"),
+    "title": attribute("title"),
+    "description": attribute("description"),
+    "category": attribute("category"),
+    "condition": attribute("condition"),
+    "image_url": ApiField(image_url, "image_url"),
+    "user": attribute("user_id", "user"),
+    "username": ApiField(
+        lambda obj: obj.user.username if obj.user_id else None,
+        "user",
+        "user__username",
+    ),
+    "created_at": attribute("created_at"),
+    "updated_at": attribute("updated_at"),
+}
+
+PROPOSAL_FIELDS = {
+    "id": attribute("id"),
+    "ad_sender": attribute("ad_sender_id", "ad_sender"),
+    "ad_receiver": attribute("ad_receiver_id", "ad_receiver"),
+    "sender_user": attribute("sender_user_id", "sender_user"),
+    "receiver_user": attribute("receiver_user_id", "receiver_user"),
+    "comment": attribute("comment"),
+    "status": attribute("status"),
+    "created_at": attribute("created_at"),
+    "updated_at": attribute("updated_at"),
+}
+
+
+def json_etag(content):
+    return quote_etag(hashlib.md5(content).hexdigest())
+
+
+@method_decorator(gzip_page, name="dispatch")
+class ApiView(View):
+    """
+    Базовое представление JSON API: выбор полей через ?fields=a,b,
+    ответы-ошибки в JSON и условные запросы по ETag/Last-Modified.
+    """
+
+    model = None
+    api_fields = {}
+    login_required = False
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.login_required and not request.user.is_authenticated:
+                raise ApiError(401, "Требуется авторизация")
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse(
+                {"error": error.message, **error.extra}, status=error.status
+            )
+        except Http404:
+            return JsonResponse({"error": "Не найдено"}, status=404)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        return JsonResponse(
+            {"error": "Метод не поддерживается"},
+            status=405,
+            headers={"Allow": response["Allow"]},
+        )
+
+    def get_fields(self):
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.api_fields)
+        fields = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in self.api_fields]
+        if unknown:
+            raise ApiError(400, "Неизвестные поля", fields=unknown)
+        return fields
+
+    def get_base_queryset(self):
+        return self.model.objects.all()
+
+    def get_queryset(self, fields):
+        # Читаются только колонки запрошенных полей и ключ курсора
+        columns = {"id", "created_at"}
+        for name in fields:
+            columns.update(self.api_fields[name].columns)
+        related = {column.split("__")[0] for column in columns if "__" in column}
+        queryset = self.get_base_queryset()
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def serialize(self, obj, fields):
+        return {name: self.api_fields[name].getter(obj) for name in fields}
+
+    def get_json_body(self):
+        if self.request.content_type != "application/json":
+            return self.request.POST
+        try:
+            data = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ApiError(400, "Некорректный JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Ожидается JSON-объект")
+        return data
+
+    def conditional_response(self, etag, last_modified=None):
+        # 304 без тела, если у клиента уже есть эта версия
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified=None):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+    def render(self, data, status=200, etag=None, last_modified=None):
+        conditional = status == 200 and self.request.method in ("GET", "HEAD")
+        if conditional and etag:
+            response = self.conditional_response(etag, last_modified)
+            if response is not None:
+                return response
+
+        content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+        if conditional and not etag:
+            etag = json_etag(content)
+            response = self.conditional_response(etag, last_modified)
+            if response is not None:
+                return response
+
+        response = HttpResponse(content, content_type="application/json", status=status)
+        if conditional:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+
+class ApiListView(ApiView):
+    def get_page_size(self):
+        try:
+            limit = int(self.request.GET.get("limit", API_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, "Некорректный limit")
+        return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    def filter_queryset(self, queryset):
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        queryset = self.filter_queryset(self.get_queryset(fields))
+        paginator = CursorPaginator(queryset, self.get_page_size())
+        page = paginator.page(request.GET.get("cursor"))
+        return self.render(
+            {
+                "results": [self.serialize(obj, fields) for obj in page],
+                "next": page.next_cursor,
+                "previous": page.previous_cursor,
+            }
+        )
+
+
+class ApiDetailView(ApiView):
+    def get_object(self, fields):
+        obj = self.get_queryset(fields).filter(pk=self.kwargs["pk"]).first()
+        if obj is None:
+            raise Http404
+        return obj
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        obj = self.get_object([*fields, "updated_at"])
+        # Версия объекта и набор полей однозначно определяют тело ответа
+        etag = quote_etag(
+            f"{obj.pk}-{obj.updated_at.timestamp()}-"
+            + hashlib.md5(",".join(fields).encode()).hexdigest()[:8]
+        )
+        return self.render(
+            self.serialize(obj, fields),
+            etag=etag,
+            last_modified=int(obj.updated_at.timestamp()),
+        )
+
+
+class AdListApiView(ApiListView):
+    model = Ad
+    api_fields = AD_FIELDS
+
+    def filter_queryset(self, queryset):
+        query = self.request.GET.get("q")
+        category = self.request.GET.get("category")
+        condition = self.request.GET.get("condition")
+        if query:
+            queryset = get_search_backend().search(queryset, query)
+        if category:
+            queryset = queryset.filter(category=category)
+        if condition:
+            queryset = queryset.filter(condition=condition)
+        return queryset
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError(401, "Требуется авторизация")
+        form = AdForm(self.get_json_body(), request.FILES)
+        if not form.is_valid():
+            raise ApiError(400, "Ошибка валидации", errors=form.errors.get_json_data())
+        form.instance.user = request.user
+        with transaction.atomic():
+            ad = form.save()
+        return self.render(self.serialize(ad, list(AD_FIELDS)), status=201)
+
+
+class AdDetailApiView(ApiDetailView):
+    model = Ad
+    api_fields = AD_FIELDS
+
+
+class ProposalApiMixin:
+    model = ExchangeProposal
+    api_fields = PROPOSAL_FIELDS
+    login_required = True
+
+    def get_base_queryset(self):
+        return ExchangeProposal.objects.for_user(self.request.user)
+
+
+class ProposalListApiView(ProposalApiMixin, ApiListView):
+    def filter_queryset(self, queryset):
+        box = self.request.GET.get("box")
+        status = self.request.GET.get("status")
+        if box == "inbox":
+            queryset = queryset.filter(receiver_user=self.request.user)
+        elif box == "outbox":
+            queryset = queryset.filter(sender_user=self.request.user)
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+
+    def post(self, request, *args, **kwargs):
+        form = ExchangeProposalForm(self.get_json_body(), user=request.user)
+        if not form.is_valid():
+            raise ApiError(400, "Ошибка валидации", errors=form.errors.get_json_data())
+        with transaction.atomic():
+            proposal = form.save()
+        return self.render(self.serialize(proposal, list(PROPOSAL_FIELDS)), status=201)
+
+
+class ProposalDetailApiView(ProposalApiMixin, ApiDetailView):
+    pass
+
+
+class ProposalTransitionApiView(ProposalApiMixin, ApiView):
+    transition = None
+    errors = {
+        TransitionResult.NOT_FOUND: (404, "Не найдено"),
+        TransitionResult.FORBIDDEN: (
+            403,
+            "Ответить может только получатель предложения",
+        ),
+        TransitionResult.CONFLICT: (409, "Предложение уже рассмотрено"),
+    }
+
+    def post(self, request, *args, **kwargs):
+        result = self.transition(self.kwargs["pk"], request.user)
+        if not result.applied:
+            raise ApiError(*self.errors[result.outcome])
+        data = self.serialize(result.proposal, list(PROPOSAL_FIELDS))
+        data["auto_rejected"] = result.auto_rejected
+        return self.render(data)
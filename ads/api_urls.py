@@ -0,0 +1,31 @@
+from django.urls import path
+
+from ads.api import (
+    AdDetailApiView,
+    AdListApiView,
+    ProposalDetailApiView,
+    ProposalListApiView,
+    ProposalTransitionApiView,
+)
+from ads.services import accept_proposal, reject_proposal
+
+app_name = "api"
+
+urlpatterns = [
+    path("ads/", AdListApiView.as_view(), name="ad_list"),
+    path("ads/<int:pk>/", AdDetailApiView.as_view(), name="ad_detail"),
+    path("proposals/", ProposalListApiView.as_view(), name="proposal_list"),
+    path(
+        "proposals/<int:pk>/", ProposalDetailApiView.as_view(), name="proposal_detail"
+    ),
+    path(
+        "proposals/<int:pk>/accept/",
+        ProposalTransitionApiView.as_view(transition=accept_proposal),
+        name="proposal_accept",
+    ),
+    path(
+        "proposals/<int:pk>/reject/",
+        ProposalTransitionApiView.as_view(transition=reject_proposal),
+        name="proposal_reject",
+    ),
+]
@@ -0,0 +1,192 @@
+import asyncio
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views import View
+
+from ads.caching import AsyncCachedResponseMixin
+from ads.events import format_sse, get_broker
+from ads.facets import aget_facets
+from ads.models import Ad, ExchangeProposal
+from ads.paginators import (
+    CursorPaginator,
+    EstimatedCountPaginator,
+    aestimate_count,
+    aget_page,
+)
+from ads.stats import aget_user_stats
+from ads.views import (
+    AdListView,
+    ExchangeProposalListView,
+    filter_ads,
+    filter_proposals,
+    proposal_participants,
+)
+
+
+class AsyncRequestMixin:
+    """
+    Загружает пользователя (и сессию) и его счетчики через async API до
+    остального кода представления: шаблоны и миксины дальше работают
+    без запросов к БД.
+    """
+
+    load_user_stats = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if self.load_user_stats:
+            request.user_stats = await aget_user_stats(request.user)
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
+class AsyncListPaginationMixin:
+    """Async-версия ListPaginationMixin: COUNT и выборка страницы через async ORM."""
+
+    paginate_by = None
+    cursor_ordering = ("-created_at", "-id")
+
+    async def paginate(self, queryset):
+        if settings.CURSOR_PAGINATION:
+            paginator = CursorPaginator(
+                queryset,
+                self.paginate_by,
+                ordering=self.cursor_ordering,
+                estimate=settings.PAGINATION_ESTIMATE_COUNT,
+            )
+            page = await paginator.apage(self.request.GET.get("cursor"))
+            if settings.PAGINATION_ESTIMATE_COUNT:
+                paginator.__dict__["count"] = await aestimate_count(queryset)
+        else:
+            paginator_class = (
+                EstimatedCountPaginator
+                if settings.PAGINATION_ESTIMATE_COUNT
+                else Paginator
+            )
+            paginator = paginator_class(queryset, self.paginate_by)
+            page = await aget_page(paginator, self.request.GET.get("page"))
+        return {
+            "paginator": paginator,
+            "page_obj": page,
+            "ads": page,
+            "is_paginated": page.has_other_pages(),
+            "object_list": page.object_list,
+            "cursor_pagination": settings.CURSOR_PAGINATION,
+            "show_estimated_count": settings.PAGINATION_ESTIMATE_COUNT,
+        }
+
+
+class AsyncAdListView(
+    AsyncRequestMixin, AsyncCachedResponseMixin, AsyncListPaginationMixin, View
+):
+    template_name = "ads/ad_list.html"
+    paginate_by = AdListView.paginate_by
+    cache_params = AdListView.cache_params
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Ad.objects.order_by(*AdListView.ordering)
+        if request.GET.get("q"):
+            # построение индекса поиска в памяти может читать БД
+            queryset = await sync_to_async(filter_ads)(queryset, request.GET)
+        else:
+            queryset = filter_ads(queryset, request.GET)
+
+        context = await self.paginate(queryset)
+        facets = await aget_facets()
+        context.update(
+            view=self,
+            ad_list=context["object_list"],
+            categories=facets["categories"],
+            condition_counts=facets["conditions"],
+            selected_category=request.GET.get("category"),
+            selected_condition=request.GET.get("condition"),
+            selected_status=request.GET.get("status"),
+        )
+        return render(request, self.template_name, context)
+
+
+class AsyncAdDetailView(AsyncRequestMixin, LoginRequiredMixin, View):
+    template_name = "ads/ad_detail.html"
+
+    async def get(self, request, *args, **kwargs):
+        ad = await aget_object_or_404(
+            Ad.objects.select_related("user"), pk=self.kwargs["pk"]
+        )
+        return render(
+            request, self.template_name, {"view": self, "object": ad, "ad": ad}
+        )
+
+
+class AsyncExchangeProposalListView(
+    AsyncRequestMixin, LoginRequiredMixin, AsyncListPaginationMixin, View
+):
+    template_name = "ads/exchangeproposal_list.html"
+    paginate_by = ExchangeProposalListView.paginate_by
+
+    async def get(self, request, *args, **kwargs):
+        queryset = filter_proposals(
+            ExchangeProposal.objects.for_user(request.user).order_by(
+                *ExchangeProposalListView.ordering
+            ),
+            request.GET,
+        )
+        context = await self.paginate(queryset)
+        context.update(
+            view=self,
+            proposals=context["object_list"],
+            status_choices=ExchangeProposal.ExchangeChoices.choices,
+            senders=[
+                row async for row in proposal_participants(request.user, "sender_user")
+            ],
+            receivers=[
+                row
+                async for row in proposal_participants(request.user, "receiver_user")
+            ],
+            selected_sender=request.GET.get("sender"),
+            selected_receiver=request.GET.get("receiver"),
+            selected_status=request.GET.get("status"),
+            proposal_events=isinstance(request, ASGIRequest),
+        )
+        return render(request, self.template_name, context)
+
+
+class ProposalEventsView(AsyncRequestMixin, LoginRequiredMixin, View):
+    """
+    Server-Sent Events: новые предложения и смена статуса для текущего
+    пользователя. Держит соединение открытым, поэтому работает только под ASGI.
+    """
+
+    load_user_stats = False
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            # 204 - сигнал EventSource больше не переподключаться
+            return HttpResponse(status=204)
+        return StreamingHttpResponse(
+            self.stream(request.user.pk),
+            content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def stream(self, user_id):
+        with get_broker().subscribe(user_id) as subscription:
+            yield f"retry: {settings.SSE_RETRY * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), settings.SSE_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    # комментарий не дает прокси закрыть соединение по простою
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
@@ -0,0 +1,171 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ads.loadtest import percentile
+from ads.models import Ad, ExchangeProposal
+from ads.seeding import CATEGORIES, rebuild_derived, seed
+
+SEARCH_WORDS = tuple(
+    item.split()[0].lower() for _, items in CATEGORIES.values() for item in items
+)
+SCENARIOS = (
+    "ad_list",
+    "ad_detail",
+    "search",
+    "exchange_proposal_list",
+    "accept_proposal",
+    "reject_proposal",
+)
+
+
+class BenchmarkData:
+    """Данные для сценариев: объявления и входящие предложения пользователя."""
+
+    def __init__(self, user, ad_ids, accept_ids, reject_ids):
+        self.user = user
+        self.ad_ids = ad_ids
+        self.accept_ids = accept_ids
+        self.reject_ids = reject_ids
+
+
+def prepare(users, ads, proposals, iterations, seed_value=0):
+    _, ad_ids, _ = seed(users, ads, proposals, seed=seed_value)
+    user = User.objects.create_user(username="benchmark")
+    sender = User.objects.create_user(username="benchmark_sender")
+    # Каждое предложение на отдельное объявление пользователя: принятие
+    # одного не отклоняет остальные, и все замеры идут по одному пути.
+    # Объявлений столько, сколько нужно итерациям, независимо от --ads
+    count = iterations * 2
+    own_ads = Ad.objects.bulk_create(
+        Ad(user=user, title=f"benchmark {number}", category="benchmark")
+        for number in range(count)
+    )
+    sender_ads = Ad.objects.bulk_create(
+        Ad(user=sender, title=f"benchmark offer {number}", category="benchmark")
+        for number in range(count)
+    )
+    pending = ExchangeProposal.objects.bulk_create(
+        ExchangeProposal(
+            ad_sender=ad_sender,
+            ad_receiver=ad,
+            sender_user=sender,
+            receiver_user=user,
+            comment="benchmark",
+        )
+        for ad, ad_sender in zip(own_ads, sender_ads)
+    )
+    # bulk_create не шлет сигналы
+    rebuild_derived()
+    proposal_ids = [proposal.pk for proposal in pending]
+    return BenchmarkData(user, ad_ids, proposal_ids[::2], proposal_ids[1::2])
+
+
+def scenario_requests(name, data, iteration):
+    if name == "ad_list":
+        return "get", reverse("ads:ad_list"), {"page": iteration % 5 + 1}
+    if name == "ad_detail":
+        ad_id = data.ad_ids[iteration % len(data.ad_ids)]
+        return "get", reverse("ads:ad_detail", args=[ad_id]), {}
+    if name == "search":
+        return (
+            "get",
+            reverse("ads:ad_list"),
+            {"q": SEARCH_WORDS[iteration % len(SEARCH_WORDS)]},
+        )
+    if name == "exchange_proposal_list":
+        return "get", reverse("ads:exchange_proposal_list"), {}
+    if name == "accept_proposal":
+        proposal_id = data.accept_ids[iteration]
+        return "post", reverse("ads:accept_proposal", args=[proposal_id]), {}
+    if name == "reject_proposal":
+        proposal_id = data.reject_ids[iteration]
+        return "post", reverse("ads:reject_proposal", args=[proposal_id]), {}
+    raise ValueError(f"Неизвестный сценарий: {name}")
+
+
+def run_scenario(client, name, data, iterations):
+    method, path, params = scenario_requests(name, data, 0)
+    if method == "get":
+        # прогрев: компиляция шаблонов и построение индекса не входят в замер
+        client.get(path, params)
+    latencies = []
+    queries = []
+    for iteration in range(iterations):
+        method, path, params = scenario_requests(name, data, iteration)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: {path} вернул {response.status_code}")
+        queries.append(len(context.captured_queries))
+    return {
+        "requests": iterations,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "queries": max(queries),
+    }
+
+
+def run_benchmark(data, iterations, scenarios=SCENARIOS):
+    client = Client()
+    client.force_login(data.user)
+    return {name: run_scenario(client, name, data, iterations) for name in scenarios}
+
+
+def check_params(baseline, params):
+    """Параметры прогона, с которыми базовые значения несравнимы."""
+    saved = baseline.get("params", {})
+    return [
+        f"{name}: {saved.get(name)} в базовых, {value} сейчас"
+        for name, value in params.items()
+        if saved.get(name) != value
+    ]
+
+
+def compare(results, baseline, threshold):
+    """
+    Сравнивает результаты с базовыми. Регрессия - рост числа запросов
+    или p95 больше чем в (1 + threshold) раз.
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if stats["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: SQL-запросов {stats['queries']} вместо {base['queries']}"
+            )
+        if stats["p95"] > base["p95"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {stats['p95']:.1f} мс вместо {base['p95']:.1f} мс"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, params):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {"params": params, "results": results},
+            file,
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        )
+        file.write("\n")
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import os
+from collections import Counter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from ads import facets, matching, stats
+from ads.caching import bump_listing_version
+from ads.forms import AdForm
+from ads.models import Ad
+from ads.search import get_search_backend
+
+FORMATS = ("csv", "jsonl")
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "category",
+    "condition",
+    "image_url",
+    "user__username",
+    "created_at",
+)
+EXPORT_HEADER = tuple(field.replace("user__", "") for field in EXPORT_FIELDS)
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.errors.append({"line": line, "errors": errors})
+
+
+def guess_format(filename, default="csv"):
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return extension if extension in FORMATS else default
+
+
+def text_stream(file):
+    if isinstance(file, io.TextIOBase):
+        return file
+    # utf-8-sig снимает BOM, который добавляет Excel при сохранении CSV
+    return io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+
+def iter_rows(file, format="csv"):
+    """
+    Читает файл построчно и отдает (номер строки, словарь | None, ошибка).
+    Файл не загружается в память целиком.
+    """
+    stream = text_stream(file)
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f"Некорректный JSON: {error}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Ожидается JSON-объект"
+            continue
+        yield line_number, row, None
+
+
+def insert_batch(batch):
+    with transaction.atomic():
+        created = Ad.objects.bulk_create(batch)
+        # bulk_create не вызывает сигналы: счетчики, поиск и кеш списков
+        # обновляются один раз на пачку
+        facets.apply_deltas(Counter(facets.facet_key(ad) for ad in created))
+        matching.apply_deltas(
+            Counter((ad.user_id, facets.facet_key(ad), "has_count") for ad in created)
+        )
+        stats.apply_deltas(
+            {
+                user_id: Counter(ad_count=total)
+                for user_id, total in Counter(ad.user_id for ad in created).items()
+            }
+        )
+        get_search_backend().index_many(created)
+        bump_listing_version()
+    return len(created)
+
+
+def import_ads(file, user, format="csv", batch_size=IMPORT_BATCH_SIZE):
+    result = ImportResult()
+    batch = []
+    for line, row, error in iter_rows(file, format):
+        if error:
+            result.add_error(line, {"__all__": [error]})
+            continue
+        form = AdForm(data={key: value for key, value in row.items() if key})
+        if not form.is_valid():
+            result.add_error(
+                line,
+                {
+                    field: [item["message"] for item in messages]
+                    for field, messages in form.errors.get_json_data().items()
+                },
+            )
+            continue
+        ad = form.save(commit=False)
+        ad.user = user
+        batch.append(ad)
+        if len(batch) >= batch_size:
+            result.created += insert_batch(batch)
+            batch = []
+    if batch:
+        result.created += insert_batch(batch)
+    return result
+
+
+class Echo:
+    """Буфер для csv.writer, который просто возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset=None):
+    queryset = Ad.objects.all() if queryset is None else queryset
+    return (
+        queryset.order_by("id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def export_ads(format="csv", queryset=None):
+    """Генератор строк выгрузки: память не зависит от размера таблицы."""
+    if format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_HEADER)
+        for row in export_rows(queryset):
+            yield writer.writerow(row)
+        return
+
+    for row in export_rows(queryset):
+        yield (
+            json.dumps(
+                dict(zip(EXPORT_HEADER, row)), cls=DjangoJSONEncoder, ensure_ascii=False
+            )
+            + "\n"
+        )
@@ -0,0 +1,132 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+
+LISTING_VERSION_KEY = "ads:listing_version"
+
+
+def listing_version():
+    version = cache.get(LISTING_VERSION_KEY)
+    if version is None:
+        cache.add(LISTING_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(LISTING_VERSION_KEY)
+    return version
+
+
+async def alisting_version():
+    version = await cache.aget(LISTING_VERSION_KEY)
+    if version is None:
+        await cache.aadd(LISTING_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(LISTING_VERSION_KEY)
+    return version
+
+
+def _bump_listing_version():
+    try:
+        cache.incr(LISTING_VERSION_KEY)
+    except ValueError:
+        cache.set(LISTING_VERSION_KEY, time.time_ns(), None)
+
+
+def bump_listing_version():
+    _bump_listing_version()
+    # повторно после коммита, чтобы не закешировать страницу до него
+    transaction.on_commit(_bump_listing_version)
+
+
+class ResponseCacheBase:
+    """
+    Кеширует готовые ответы для анонимных пользователей по GET-параметрам.
+    Кеш сбрасывается сменой версии при изменении объявлений. Сохраняет ответ
+    ResponseCacheMiddleware, когда его уже обработали все middleware.
+    """
+
+    cache_params = ()
+
+    def get_response_cache_key(self, request, version=None):
+        # все значения параметров: шаблоны выводят их обратно в страницу
+        params = sorted(
+            (name, value)
+            for name in self.cache_params
+            for value in request.GET.getlist(name)
+        )
+        digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+        auth = "user" if request.user.is_authenticated else "anon"
+        if version is None:
+            version = listing_version()
+        return f"ads:response:{type(self).__name__}:{version}:{auth}:{digest}"
+
+    def is_response_cacheable(self, request):
+        # Страницы пользователя содержат CSRF-токен и сообщения, их не кешируем;
+        # посторонние параметры попали бы в ссылки страницы мимо ключа
+        return (
+            settings.RESPONSE_CACHE_TIMEOUT
+            and request.method in ("GET", "HEAD")
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not request.user.is_authenticated
+            and set(request.GET) <= set(self.cache_params)
+        )
+
+    def cache_hit(self, request, response):
+        # request.response_cache_hit попадает в метрику ads_response_cache_total
+        request.response_cache_hit = True
+        response["X-Cache"] = "HIT"
+        return response
+
+    def cache_miss(self, request, key, response):
+        request.response_cache_hit = False
+        request.response_cache_key = key
+        patch_vary_headers(response, ("Cookie",))
+        response["X-Cache"] = "MISS"
+        return response
+
+
+def response_cache_key(request, response):
+    """
+    Ключ для сохранения ответа или None. Вызывается после всех middleware:
+    ответ отрисован, и видны cookie, выставленные при отрисовке и в middleware.
+    """
+    key = getattr(request, "response_cache_key", None)
+    if (
+        key is None
+        or response.status_code != 200
+        or response.streaming
+        or response.cookies
+    ):
+        return None
+    return key
+
+
+class CachedResponseMixin(ResponseCacheBase):
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            return self.cache_hit(request, response)
+
+        response = super().dispatch(request, *args, **kwargs)
+        return self.cache_miss(request, key, response)
+
+
+class AsyncCachedResponseMixin(ResponseCacheBase):
+    """Тот же кеш ответов для async-представлений: асинхронные вызовы кеша."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return await super().dispatch(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request, await alisting_version())
+        response = await cache.aget(key)
+        if response is not None:
+            return self.cache_hit(request, response)
+
+        response = await super().dispatch(request, *args, **kwargs)
+        return self.cache_miss(request, key, response)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from ads.stats import get_user_stats
+
+
+def fragment_cache(request):
+    return {"FRAGMENT_CACHE_TIMEOUT": settings.FRAGMENT_CACHE_TIMEOUT}
+
+
+def user_stats(request):
+    # async-представления загружают счетчики заранее (AsyncRequestMixin),
+    # в остальных - один запрос по первичному ключу при первом обращении
+    if hasattr(request, "user_stats"):
+        return {"user_stats": request.user_stats}
+    return {"user_stats": SimpleLazyObject(lambda: get_user_stats(request.user))}
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ads_events"
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Очередь событий одного подключения; наполняется из любого потока."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, event):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            # медленный клиент теряет самые старые события, а не память сервера
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InMemoryBroker:
+    """Рассылка событий подписчикам внутри одного процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in set(event["users"])
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    События между процессами через LISTEN/NOTIFY: NOTIFY отправляется после
+    коммита изменения, а поток-слушатель в каждом процессе раздает
+    полученные события своим подписчикам.
+    """
+
+    def __init__(self, using="default"):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def publish(self, event):
+        from django.db import connections
+
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(event)])
+
+    def subscribe(self, user_id):
+        self._start_listener()
+        return super().subscribe(user_id)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="ads-events-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        from django.db import connections
+
+        while True:
+            listener = None
+            try:
+                wrapper = connections[self.using]
+                listener = wrapper.get_new_connection(wrapper.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                for notify in self._notifications(listener):
+                    self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception("Соединение LISTEN %s потеряно", CHANNEL)
+                if listener is not None:
+                    listener.close()
+                time.sleep(1)
+
+    def _notifications(self, listener):
+        """Уведомления соединения LISTEN по мере прихода: psycopg 2 и 3."""
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        while True:
+            if is_psycopg3:
+                # генератор завершается по таймауту, затем ждем снова
+                yield from listener.notifies(timeout=5)
+                continue
+            if select.select([listener], [], [], 5) == ([], [], []):
+                continue
+            listener.poll()
+            while listener.notifies:
+                yield listener.notifies.pop(0)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        path = getattr(settings, "EVENTS_BROKER", None)
+        if path:
+            _broker = import_string(path)()
+        elif connection.vendor == "postgresql":
+            _broker = PostgresBroker()
+        else:
+            _broker = InMemoryBroker()
+    return _broker
+
+
+def proposal_event(event_type, proposal_id, status, sender_user_id, receiver_user_id):
+    return {
+        "type": event_type,
+        "proposal": proposal_id,
+        "status": status,
+        "users": [user_id for user_id in (sender_user_id, receiver_user_id) if user_id],
+    }
+
+
+def publish(event):
+    # Подписчики получают событие только после коммита изменения
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def format_sse(event):
+    data = json.dumps(
+        {key: value for key, value in event.items() if key != "users"},
+        ensure_ascii=False,
+    )
+    return f"event: {event['type']}\ndata: {data}\n\n"
@@ -0,0 +1,112 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from ads.models import Ad, AdFacet
+
+FACETS_CACHE_KEY = "ads:facets"
+
+
+def facet_key(ad):
+    # Берем значения из __dict__, чтобы не подгружать отложенные поля
+    category = ad.__dict__.get("category")
+    condition = ad.__dict__.get("condition")
+    if category is None or condition is None:
+        return None
+    return category, condition
+
+
+def invalidate_facets():
+    cache.delete(FACETS_CACHE_KEY)
+    # повторно после коммита, чтобы не закешировать состояние до него
+    transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY))
+
+
+def apply_deltas(deltas):
+    changed = False
+    for (category, condition), delta in deltas.items():
+        if not delta:
+            continue
+        changed = True
+        facets = AdFacet.objects.filter(category=category, condition=condition)
+        if not facets.update(ad_count=F("ad_count") + delta):
+            AdFacet.objects.bulk_create(
+                [AdFacet(category=category, condition=condition)],
+                ignore_conflicts=True,
+            )
+            facets.update(ad_count=F("ad_count") + delta)
+    if changed:
+        invalidate_facets()
+
+
+def ad_saved(ad, created, previous_key):
+    current_key = facet_key(ad)
+    if current_key is None or (previous_key is None and not created):
+        return
+    deltas = Counter()
+    if created:
+        deltas[current_key] += 1
+    elif previous_key != current_key:
+        deltas[previous_key] -= 1
+        deltas[current_key] += 1
+    apply_deltas(deltas)
+
+
+def ad_deleted(ad, previous_key):
+    key = previous_key or facet_key(ad)
+    # строку уже удалили в другом месте - вычитать нечего
+    if key is not None:
+        apply_deltas(Counter({key: -1}))
+
+
+@transaction.atomic
+def rebuild_facets():
+    AdFacet.objects.all().delete()
+    AdFacet.objects.bulk_create(
+        AdFacet(
+            category=row["category"], condition=row["condition"], ad_count=row["total"]
+        )
+        for row in Ad.objects.values("category", "condition").annotate(
+            total=Count("id")
+        )
+    )
+    invalidate_facets()
+
+
+def build_facets(rows):
+    categories = Counter()
+    conditions = Counter()
+    for category, condition, ad_count in rows:
+        categories[category] += ad_count
+        conditions[condition] += ad_count
+    return {
+        "categories": [
+            {"name": name, "count": categories[name]} for name in sorted(categories)
+        ],
+        "conditions": dict(conditions),
+    }
+
+
+def facet_rows():
+    return AdFacet.objects.filter(ad_count__gt=0).values_list(
+        "category", "condition", "ad_count"
+    )
+
+
+def get_facets():
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = build_facets(facet_rows())
+        cache.set(FACETS_CACHE_KEY, facets, settings.FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_facets():
+    facets = await cache.aget(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = build_facets([row async for row in facet_rows()])
+        await cache.aset(FACETS_CACHE_KEY, facets, settings.FACETS_CACHE_TIMEOUT)
+    return facets
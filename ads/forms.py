@@ -1,6 +1,12 @@
+import copy
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.forms import BooleanField, ModelForm
+from django.core.exceptions import ValidationError
+from django.forms import BooleanField, ChoiceField, FileField, Form, ModelForm, Select
+from django.template.defaultfilters import filesizeformat
+from django.urls import reverse
 
 from ads.models import Ad, ExchangeProposal
 
@@ -32,10 +38,66 @@ class AdForm(StyleFormMixin, ModelForm):
         exclude = ("id", "user", "created_at")
 
 
+class AdImportForm(StyleFormMixin, Form):
+    file = FileField(label="Файл", help_text="CSV с заголовком или JSONL")
+    format = ChoiceField(
+        label="Формат",
+        required=False,
+        choices=[("", "По расширению файла"), ("csv", "CSV"), ("jsonl", "JSONL")],
+    )
+
+    def clean_file(self):
+        # Импорт выполняется в запросе: размер и число строк ограничены
+        upload = self.cleaned_data["file"]
+        if upload.size > settings.AD_IMPORT_MAX_SIZE:
+            raise ValidationError(
+                "Файл больше %(limit)s",
+                code="too_large",
+                params={"limit": filesizeformat(settings.AD_IMPORT_MAX_SIZE)},
+            )
+        lines = sum(1 for _ in upload)
+        upload.seek(0)
+        if lines > settings.AD_IMPORT_MAX_LINES:
+            raise ValidationError(
+                "В файле больше %(limit)s строк",
+                code="too_many_lines",
+                params={"limit": settings.AD_IMPORT_MAX_LINES},
+            )
+        return upload
+
+
+class AdLookupWidget(Select):
+    """
+    Список только с выбранным объявлением: остальные варианты подгружает
+    ads:ad_lookup по мере ввода, поэтому размер страницы не зависит от
+    числа объявлений. Выбор проверяет поле формы запросом по pk.
+    """
+
+    template_name = "ads/widgets/ad_lookup.html"
+    lookup_url = "ads:ad_lookup"
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        self.choices = copy.copy(choices)
+        self.choices.queryset = choices.queryset.filter(
+            pk__in=[pk for pk in value if str(pk).isdigit()]
+        )
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["lookup_url"] = reverse(self.lookup_url)
+        return context
+
+
 class ExchangeProposalForm(StyleFormMixin, ModelForm):
     class Meta:
         model = ExchangeProposal
         exclude = ("id", "created_at", "status")
+        widgets = {"ad_receiver": AdLookupWidget}
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user")
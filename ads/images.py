@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Размеры превью (ширина, высота) для 1x; для 2x размеры удваиваются
+THUMBNAIL_SIZES = {
+    "card": (400, 300),
+    "detail": (900, 700),
+}
+THUMBNAIL_DENSITIES = (1, 2)
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+}
+THUMBNAIL_QUALITY = 80
+
+
+def derivative_name(name, size, density, extension):
+    root, _ = os.path.splitext(name)
+    return f"{root}.{size}-{density}x.{extension}"
+
+
+def derivative_names(name):
+    for size in THUMBNAIL_SIZES:
+        for density in THUMBNAIL_DENSITIES:
+            for extension in THUMBNAIL_FORMATS:
+                yield derivative_name(name, size, density, extension)
+
+
+def open_image(name, storage=default_storage):
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_thumbnails(name, storage=default_storage):
+    original = open_image(name, storage)
+    created = []
+    for size, (width, height) in THUMBNAIL_SIZES.items():
+        for density in THUMBNAIL_DENSITIES:
+            resized = original.copy()
+            resized.thumbnail((width * density, height * density), Image.LANCZOS)
+            for extension, (image_format, _) in THUMBNAIL_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(
+                    buffer, image_format, quality=THUMBNAIL_QUALITY, optimize=True
+                )
+                target = derivative_name(name, size, density, extension)
+                if storage.exists(target):
+                    storage.delete(target)
+                created.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return created
+
+
+def delete_thumbnails(name, storage=default_storage):
+    for target in derivative_names(name):
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def thumbnail_srcset(name, size, extension, storage=default_storage):
+    return ", ".join(
+        f"{storage.url(derivative_name(name, size, density, extension))} {density}x"
+        for density in THUMBNAIL_DENSITIES
+    )
@@ -0,0 +1,93 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ads.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name):
+    def decorator(func):
+        registry[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(task_name, /, *, delay=None, max_attempts=None, **payload):
+    if task_name not in registry:
+        raise KeyError(f"Неизвестная задача: {task_name}")
+    job = Job.objects.create(
+        name=task_name,
+        payload=payload,
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_pending(job_ids=[job.pk]))
+    return job
+
+
+def backoff(attempts):
+    seconds = settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.JOBS_BACKOFF_MAX))
+
+
+def claim(limit, job_ids=None):
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    with transaction.atomic():
+        jobs = Job.objects.filter(
+            Q(status=Job.StatusChoices.PENDING, run_at__lte=now)
+            # задачи упавшего воркера возвращаются в работу по таймауту
+            | Q(status=Job.StatusChoices.RUNNING, updated_at__lte=stale)
+        ).order_by("run_at")
+        if job_ids is not None:
+            jobs = jobs.filter(pk__in=job_ids)
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        claimed = list(jobs[:limit])
+        Job.objects.filter(pk__in=[job.pk for job in claimed]).update(
+            status=Job.StatusChoices.RUNNING,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+    for job in claimed:
+        job.attempts += 1
+    return claimed
+
+
+def run(job):
+    try:
+        registry[job.name](**job.payload)
+    except Exception:
+        logger.exception("Задача %s (%s) завершилась ошибкой", job.pk, job.name)
+        jobs = Job.objects.filter(pk=job.pk)
+        if job.attempts >= job.max_attempts:
+            jobs.update(
+                status=Job.StatusChoices.FAILED, last_error=traceback.format_exc()
+            )
+        else:
+            jobs.update(
+                status=Job.StatusChoices.PENDING,
+                run_at=timezone.now() + backoff(job.attempts),
+                last_error=traceback.format_exc(),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(limit=None, job_ids=None):
+    claimed = claim(limit or settings.JOBS_BATCH_SIZE, job_ids)
+    for job in claimed:
+        run(job)
+    return len(claimed)
@@ -0,0 +1,50 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def fetch(url, headers, timeout):
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    except (URLError, OSError):
+        status = None
+    return status, time.perf_counter() - started
+
+
+def run_load(url, requests, concurrency, headers=None, timeout=10):
+    """
+    Нагружает url из concurrency потоков и возвращает пропускную способность
+    и перцентили задержки в миллисекундах.
+    """
+    headers = headers or {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(
+            executor.map(lambda _: fetch(url, headers, timeout), range(requests))
+        )
+    elapsed = time.perf_counter() - started
+    latencies = [duration * 1000 for status, duration in results if status == 200]
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(status != 200 for status, _ in results),
+        "rps": len(latencies) / elapsed if elapsed else 0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from ads.benchmark import (
+    SCENARIOS,
+    check_params,
+    compare,
+    load_baseline,
+    prepare,
+    run_benchmark,
+    save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк представлений на синтетических данных во временной тестовой БД: "
+        "перцентили задержки и число SQL-запросов сравниваются с базовыми "
+        "значениями из JSON-файла"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--ads", type=int, default=5000)
+        parser.add_argument("--proposals", type=int, default=5000)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+        )
+        parser.add_argument(
+            "--baseline", default=str(settings.BASE_DIR / "benchmark_baseline.json")
+        )
+        parser.add_argument(
+            "--save", action="store_true", help="Записать результаты как базовые"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Допустимый рост p95 относительно базового, доля",
+        )
+
+    def handle(self, *args, **options):
+        # Задержки зависят от объема данных: базовые значения сравнимы
+        # только при тех же параметрах
+        params = {
+            name: options[name]
+            for name in ("users", "ads", "proposals", "iterations", "seed")
+        }
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            data = prepare(
+                options["users"],
+                options["ads"],
+                options["proposals"],
+                options["iterations"],
+                seed_value=options["seed"],
+            )
+            results = run_benchmark(data, options["iterations"], options["scenario"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{'сценарий':<26}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}"
+            f"{'SQL':>6}"
+        )
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<26}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+                f"{stats['p99']:>10.1f}{stats['queries']:>6}"
+            )
+
+        if options["save"]:
+            save_baseline(options["baseline"], results, params)
+            self.stdout.write(self.style.SUCCESS(f"Записано в {options['baseline']}"))
+            return
+
+        baseline = load_baseline(options["baseline"])
+        if baseline is None:
+            self.stdout.write(
+                f"Базовых значений нет ({options['baseline']}), запустите с --save"
+            )
+            return
+        mismatched = check_params(baseline, params)
+        if mismatched:
+            raise CommandError(
+                "Базовые значения сняты с другими параметрами:\n"
+                + "\n".join(mismatched)
+            )
+        regressions = compare(results, baseline["results"], options["threshold"])
+        if regressions:
+            raise CommandError("Регрессия:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand
+from django.core.paginator import Paginator
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from ads.models import Ad
+
+LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+TEMPLATES = ["ads/ad_list.html", "ads/base.html", "ads/login.html"]
+
+
+def make_engine(name, cached):
+    loaders = (
+        [("django.template.loaders.cached.Loader", LOADERS)] if cached else LOADERS
+    )
+    options = dict(settings.TEMPLATES[0]["OPTIONS"], loaders=loaders)
+    return DjangoTemplates(
+        {
+            "NAME": name,
+            "DIRS": settings.TEMPLATES[0]["DIRS"],
+            "APP_DIRS": False,
+            "OPTIONS": options,
+        }
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время загрузки и отрисовки страниц без кеша шаблонов "
+        "и с кеширующим загрузчиком"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--template", action="append", dest="templates")
+
+    def get_context(self):
+        ads = Ad.objects.select_related("user").order_by("-created_at", "-id")
+        page = Paginator(list(ads[:10]), 10).page(1)
+        return {
+            "ads": page,
+            "object_list": page.object_list,
+            # карточки рисуются каждый раз, без кеша фрагментов
+            "FRAGMENT_CACHE_TIMEOUT": 0,
+        }
+
+    def measure(self, engine, name, context, request, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            engine.get_template(name).render(context, request)
+        return (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        context = self.get_context()
+        plain = make_engine("uncached", cached=False)
+        cached = make_engine("cached", cached=True)
+
+        self.stdout.write(
+            f"{'шаблон':<28}{'без кеша, мс':>14}{'с кешем, мс':>14}{'ускорение':>12}"
+        )
+        for name in options["templates"] or TEMPLATES:
+            # первая отрисовка заполняет кеш загрузчика, как прогрев при запуске
+            cached.get_template(name).render(context, request)
+            before = self.measure(plain, name, context, request, iterations)
+            after = self.measure(cached, name, context, request, iterations)
+            self.stdout.write(
+                f"{name:<28}{before:>14.3f}{after:>14.3f}{before / after:>11.1f}x"
+            )
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import RequestFactory
+
+from ads import services
+from ads.api import AdListApiView, ProposalListApiView
+from ads.forms import ExchangeProposalForm
+from ads.models import Ad, ExchangeProposal
+from ads.paginators import CursorPaginator
+from ads.search import tokenize
+from ads.views import AdListView, ExchangeProposalListView
+
+
+def setup_view(view_class, user, params):
+    view = view_class()
+    request = RequestFactory().get("/", params)
+    request.user = user
+    view.setup(request)
+    return view
+
+
+def list_page(view_class, user, **params):
+    """Первая страница списка: get_queryset и сортировка самого представления."""
+    view = setup_view(view_class, user, params)
+    queryset = view.get_queryset()
+    return queryset[: view.get_paginate_by(queryset)]
+
+
+def api_page(view_class, user, **params):
+    view = setup_view(view_class, user, params)
+    queryset = view.filter_queryset(view.get_queryset(view.get_fields()))
+    return CursorPaginator(queryset, view.get_page_size()).page_queryset(None)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN для запросов списков объявлений и предложений, "
+        "построенных теми же представлениями, и завершается с ошибкой, "
+        "если какой-то из них читает таблицу целиком"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def get_queries(self, using):
+        sample = Ad.objects.using(using).values(
+            "id", "title", "category", "condition", "user_id"
+        ).first() or {
+            "id": 0,
+            "title": "",
+            "category": "",
+            "condition": Ad.ConditionChoices.NEW,
+            "user_id": 0,
+        }
+        user = User(pk=sample["user_id"] or 0)
+        words = tokenize(sample["title"]) or ["поиск"]
+        awaits = ExchangeProposal.ExchangeChoices.AWAITS
+        queries = {
+            "ad_list": list_page(AdListView, user),
+            "ad_list_category": list_page(
+                AdListView, user, category=sample["category"]
+            ),
+            "ad_list_condition": list_page(
+                AdListView, user, condition=sample["condition"]
+            ),
+            "ad_list_search": list_page(AdListView, user, q=words[0]),
+            "proposal_list": list_page(ExchangeProposalListView, user),
+            "proposal_list_status": list_page(
+                ExchangeProposalListView, user, status=awaits
+            ),
+            "proposal_list_sender": list_page(
+                ExchangeProposalListView, user, sender=user.pk
+            ),
+            "proposal_list_receiver": list_page(
+                ExchangeProposalListView, user, receiver=user.pk, status=awaits
+            ),
+            "api_ad_list": api_page(AdListApiView, user),
+            "api_ad_list_category": api_page(
+                AdListApiView, user, category=sample["category"]
+            ),
+            "api_proposal_inbox": api_page(ProposalListApiView, user, box="inbox"),
+            "api_proposal_outbox": api_page(
+                ProposalListApiView, user, box="outbox", status=awaits
+            ),
+            "proposal_form_own_ads": ExchangeProposalForm(user=user)
+            .fields["ad_sender"]
+            .queryset,
+            "accept_competing_proposals": services.pending_for_ads([sample["id"]]),
+        }
+        return {name: queryset.using(using) for name, queryset in queries.items()}
+
+    def is_sequential(self, vendor, plan):
+        if vendor == "postgresql":
+            return "Seq Scan" in plan
+        if vendor == "sqlite":
+            return any(
+                " SCAN " in f" {line} " and "USING" not in line
+                for line in plan.splitlines()
+            )
+        return False
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        connection = connections[using]
+        failures = []
+        with transaction.atomic(using=using):
+            if connection.vendor == "postgresql":
+                # Без этого на маленьких таблицах планировщик всегда выбирает
+                # Seq Scan; так проверяется, что подходящий индекс вообще есть
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, queryset in self.get_queries(using).items():
+                plan = queryset.explain()
+                sequential = self.is_sequential(connection.vendor, plan)
+                if sequential:
+                    failures.append(name)
+                if sequential or options["verbosity"] > 1:
+                    self.stdout.write(f"{name}:\n{plan}\n")
+
+        if failures:
+            raise CommandError(
+                "Последовательное чтение таблицы в запросах: " + ", ".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Все запросы используют индексы"))
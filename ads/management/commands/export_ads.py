@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+
+from ads.bulk import FORMATS, export_ads
+
+
+class Command(BaseCommand):
+    help = "Выгружает все объявления в CSV или JSONL, читая таблицу порциями"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="Файл для выгрузки, по умолчанию stdout")
+
+    def handle(self, *args, **options):
+        if not options["output"]:
+            for chunk in export_ads(options["format"]):
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(options["output"], "w", encoding="utf-8", newline="") as file:
+            for chunk in export_ads(options["format"]):
+                file.write(chunk)
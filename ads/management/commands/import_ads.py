@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+
+from ads.bulk import FORMATS, IMPORT_BATCH_SIZE, guess_format, import_ads
+
+
+class Command(BaseCommand):
+    help = "Импортирует объявления из CSV или JSONL файла пачками через bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--user", required=True, help="Имя пользователя-владельца объявлений"
+        )
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+
+        path = options["path"]
+        with open(path, "rb") as file:
+            result = import_ads(
+                file,
+                user,
+                format=options["format"] or guess_format(path),
+                batch_size=options["batch_size"],
+            )
+        for error in result.errors:
+            messages = "; ".join(
+                f"{field}: {', '.join(items)}"
+                for field, items in error["errors"].items()
+            )
+            self.stderr.write(f"Строка {error['line']}: {messages}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Добавлено объявлений: {result.created}, "
+                f"строк с ошибками: {len(result.errors)}"
+            )
+        )
@@ -0,0 +1,48 @@
+from django.core.management import BaseCommand
+
+from ads.loadtest import run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест запущенного сервера: пропускная способность и задержки "
+        "при разной конкурентности. Запускается против WSGI- и ASGI-развертывания "
+        "для сравнения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument(
+            "--cookie", help="Заголовок Cookie, например sessionid=... для входа"
+        )
+
+    def handle(self, *args, **options):
+        headers = {"Cookie": options["cookie"]} if options["cookie"] else {}
+        self.stdout.write(
+            f"{'url':<40}{'потоки':>8}{'rps':>10}{'p50, мс':>10}"
+            f"{'p95, мс':>10}{'p99, мс':>10}{'ошибки':>8}"
+        )
+        for url in options["urls"]:
+            for concurrency in options["concurrency"]:
+                stats = run_load(
+                    url,
+                    options["requests"],
+                    concurrency,
+                    headers=headers,
+                    timeout=options["timeout"],
+                )
+                self.stdout.write(
+                    f"{url:<40}{concurrency:>8}{stats['rps']:>10.1f}"
+                    + "".join(
+                        (
+                            f"{stats[key]:>10.1f}"
+                            if stats[key] is not None
+                            else f"{'-':>10}"
+                        )
+                        for key in ("p50", "p95", "p99")
+                    )
+                    + f"{stats['errors']:>8}"
+                )
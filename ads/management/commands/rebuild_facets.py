@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from ads.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики категорий и состояний объявлений"
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        self.stdout.write(self.style.SUCCESS("Счетчики пересчитаны"))
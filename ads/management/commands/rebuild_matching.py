@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+
+from ads.matching import rebuild_interests, refresh_recommendations
+from ads.models import TradeInterest
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает граф «есть/нужно» для подбора обменов по объявлениям "
+        "и предложениям (после массовой загрузки или для сверки счетчиков)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recommendations",
+            action="store_true",
+            help="Сразу пересчитать рекомендации всех пользователей",
+        )
+
+    def handle(self, *args, **options):
+        rebuild_interests()
+        self.stdout.write(self.style.SUCCESS("Интересы пересчитаны"))
+        if not options["recommendations"]:
+            return
+        user_ids = (
+            TradeInterest.objects.filter(want_count__gt=0)
+            .values_list("user_id", flat=True)
+            .distinct()
+            .order_by("user_id")
+        )
+        total = 0
+        for user_id in user_ids.iterator():
+            total += len(refresh_recommendations(user_id))
+        self.stdout.write(self.style.SUCCESS(f"Рекомендаций: {total}"))
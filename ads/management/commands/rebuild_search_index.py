@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from ads.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковый индекс объявлений"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Индекс перестроен ({type(backend).__name__})")
+        )
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from ads.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики пользователей (объявления, ожидающие предложения) "
+        "и исправляет расхождения с данными"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, nargs="+", help="id пользователей")
+
+    def handle(self, *args, **options):
+        fixed = reconcile(options["user"])
+        self.stdout.write(self.style.SUCCESS(f"Исправлено строк: {fixed}"))
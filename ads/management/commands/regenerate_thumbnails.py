@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+
+from ads.images import generate_thumbnails
+from ads.models import Ad
+
+
+class Command(BaseCommand):
+    help = "Создает превью для фотографий существующих объявлений"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Обрабатывать только фотографии без готовых превью",
+        )
+
+    def handle(self, *args, **options):
+        ads = Ad.objects.exclude(image_url="").exclude(image_url__isnull=True)
+        if options["missing"]:
+            ads = ads.filter(has_thumbnails=False)
+        names = ads.values_list("image_url", flat=True).distinct()
+        done = failed = 0
+        for name in names.iterator():
+            try:
+                generate_thumbnails(name)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f"{name}: {error}")
+                continue
+            Ad.objects.filter(image_url=name).update(has_thumbnails=True)
+            done += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(name)
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано фотографий: {done}, ошибок: {failed}")
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from ads.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Запускает воркер фоновых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Выполнить готовые задачи и выйти"
+        )
+        parser.add_argument("--batch-size", type=int, default=settings.JOBS_BATCH_SIZE)
+        parser.add_argument(
+            "--sleep", type=float, default=1.0, help="Пауза при пустой очереди, сек"
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = run_pending(options["batch_size"])
+            total += processed
+            if processed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {total}"))
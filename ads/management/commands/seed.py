@@ -0,0 +1,60 @@
+import time
+from datetime import date, datetime
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from ads.seeding import BATCH_SIZE, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет БД синтетическими пользователями, объявлениями и предложениями "
+        "для нагрузочного тестирования. При одинаковом --seed данные совпадают"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--ads", type=int, default=100000)
+        parser.add_argument("--proposals", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--prefix", default="seed", help="Префикс логинов")
+        parser.add_argument(
+            "--now",
+            type=date.fromisoformat,
+            help="Дата ГГГГ-ММ-ДД, от которой отсчитываются даты объявлений "
+            "(по умолчанию фиксированная, не день запуска)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(model, written):
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {written} "
+                f"({time.perf_counter() - started:.1f} с)"
+            )
+
+        now = None
+        if options["now"]:
+            now = timezone.make_aware(
+                datetime.combine(options["now"], datetime.min.time())
+            )
+        user_ids, ad_ids, proposal_ids = seed(
+            options["users"],
+            options["ads"],
+            options["proposals"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            prefix=options["prefix"],
+            progress=progress if options["verbosity"] > 1 else None,
+            now=now,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано пользователей: {len(user_ids)}, объявлений: {len(ad_ids)}, "
+                f"предложений: {len(proposal_ids)} "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+        )
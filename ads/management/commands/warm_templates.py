@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand, CommandError
+from django.template import TemplateSyntaxError
+
+from ads.template_cache import warm_up_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Компилирует все шаблоны приложения ads: при запуске под wsgi/asgi "
+        "так прогревается кеш шаблонов, здесь - проверяется, что они собираются"
+    )
+
+    def handle(self, *args, **options):
+        try:
+            count = warm_up_templates()
+        except TemplateSyntaxError as error:
+            raise CommandError(f"Ошибка в шаблоне: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Скомпилировано шаблонов: {count}"))
@@ -0,0 +1,322 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from ads import jobs
+from ads.facets import facet_key
+from ads.models import Ad, ExchangeProposal, SwapRecommendation, TradeInterest
+
+# Цепочка из трех участников срывается чаще прямого обмена
+CYCLE_WEIGHT = 0.5
+
+
+def pending_key(user_id, cascade):
+    return f"ads:matching:pending:{user_id}:{int(cascade)}"
+
+
+def fresh_key(user_id):
+    return f"ads:matching:fresh:{user_id}"
+
+
+def key_q(keys):
+    return reduce(
+        or_, (Q(category=category, condition=condition) for category, condition in keys)
+    )
+
+
+def apply_deltas(deltas):
+    """deltas: {(user_id, (категория, состояние), поле): изменение}"""
+    changed = set()
+    for (user_id, (category, condition), field), delta in deltas.items():
+        if not delta or user_id is None:
+            continue
+        changed.add(user_id)
+        interests = TradeInterest.objects.filter(
+            user_id=user_id, category=category, condition=condition
+        )
+        if not interests.update(**{field: F(field) + delta}):
+            TradeInterest.objects.bulk_create(
+                [
+                    TradeInterest(
+                        user_id=user_id, category=category, condition=condition
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            interests.update(**{field: F(field) + delta})
+    for user_id in changed:
+        schedule_refresh(user_id, cascade=True)
+
+
+def ad_saved(ad, created, previous_user_id, previous_key):
+    current = (ad.user_id, facet_key(ad))
+    if current[1] is None:
+        return
+    deltas = Counter()
+    if created:
+        deltas[(*current, "has_count")] += 1
+    elif previous_key is not None and (previous_user_id, previous_key) != current:
+        deltas[(previous_user_id, previous_key, "has_count")] -= 1
+        deltas[(*current, "has_count")] += 1
+    apply_deltas(deltas)
+
+
+def ad_deleted(ad, previous_user_id, previous_key):
+    key = previous_key or facet_key(ad)
+    if key is not None:
+        apply_deltas(Counter({(previous_user_id, key, "has_count"): -1}))
+
+
+def proposal_created(proposal):
+    # Удаленные предложения не вычитаются: история спроса остается сигналом,
+    # точные значения восстанавливает rebuild_matching
+    key = facet_key(proposal.ad_receiver)
+    if key is not None:
+        apply_deltas(Counter({(proposal.sender_user_id, key, "want_count"): 1}))
+
+
+@transaction.atomic
+def rebuild_interests():
+    TradeInterest.objects.all().delete()
+    interests = defaultdict(lambda: [0, 0])
+    for user_id, category, condition, total in (
+        Ad.objects.exclude(user=None)
+        .values_list("user_id", "category", "condition")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        interests[user_id, category, condition][0] = total
+    for user_id, category, condition, total in (
+        ExchangeProposal.objects.exclude(sender_user=None)
+        .values_list(
+            "sender_user_id", "ad_receiver__category", "ad_receiver__condition"
+        )
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        interests[user_id, category, condition][1] = total
+    TradeInterest.objects.bulk_create(
+        (
+            TradeInterest(
+                user_id=user_id,
+                category=category,
+                condition=condition,
+                has_count=has_count,
+                want_count=want_count,
+            )
+            for (user_id, category, condition), (has_count, want_count) in (
+                interests.items()
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+def best(counts, weights=None):
+    weights = weights or counts
+    return max(counts, key=lambda key: (weights.get(key, 0), key))
+
+
+def find_matches(user_id):
+    """
+    Обмены с участием пользователя U в графе «есть/нужно»:
+    прямые (U <-> V) и цепочки U -> V -> W -> U. Поиск идет навстречу
+    с двух сторон: V - те, кому нужно то, что есть у U, W - те, у кого
+    есть нужное U; цепочка замыкается, если W нужно что-то, что есть у V.
+    Обе стороны ограничены MATCHING_FANOUT строками, поэтому число
+    запросов и объем работы не зависят от размера базы.
+    """
+    mine = TradeInterest.objects.filter(user_id=user_id).values_list(
+        "category", "condition", "has_count", "want_count"
+    )
+    haves, wants = {}, {}
+    for category, condition, has_count, want_count in mine:
+        if has_count > 0:
+            haves[category, condition] = has_count
+        if want_count > 0:
+            wants[category, condition] = want_count
+    if not haves or not wants:
+        return []
+
+    fanout = settings.MATCHING_FANOUT
+    takers = defaultdict(dict)
+    for other, category, condition, want_count in (
+        TradeInterest.objects.filter(key_q(haves), want_count__gt=0)
+        # ищущий без своих объявлений ничего не может отдать
+        .filter(
+            user_id__in=TradeInterest.objects.filter(has_count__gt=0).values("user_id")
+        )
+        .exclude(user_id=user_id)
+        .order_by("-want_count")
+        .values_list("user_id", "category", "condition", "want_count")[:fanout]
+    ):
+        takers[other][category, condition] = want_count
+    givers = defaultdict(dict)
+    for other, category, condition, has_count in (
+        TradeInterest.objects.filter(key_q(wants), has_count__gt=0)
+        # и наоборот: владелец должен что-то искать, иначе цепочка не замкнется
+        .filter(
+            user_id__in=TradeInterest.objects.filter(want_count__gt=0).values("user_id")
+        )
+        .exclude(user_id=user_id)
+        .order_by("-has_count")
+        .values_list("user_id", "category", "condition", "has_count")[:fanout]
+    ):
+        givers[other][category, condition] = has_count
+    if not takers or not givers:
+        return []
+
+    matches = []
+    for partner in takers.keys() & givers.keys():
+        give_key = best(takers[partner])
+        get_key = best(givers[partner], wants)
+        score = (takers[partner][give_key] + wants[get_key]) / 2
+        matches.append(
+            (
+                score,
+                SwapRecommendation.KindChoices.DIRECT,
+                partner,
+                None,
+                give_key,
+                get_key,
+            )
+        )
+
+    taker_haves = defaultdict(set)
+    for other, category, condition in TradeInterest.objects.filter(
+        user_id__in=list(takers), has_count__gt=0
+    ).values_list("user_id", "category", "condition"):
+        taker_haves[other].add((category, condition))
+    # Для каждой вещи - лучшие W, которым она нужна, вместе с тем,
+    # что W отдаст пользователю: перебор цепочек ограничен MATCHING_LIMIT
+    # кандидатами на вещь вместо всех пар V x W
+    third_gets = {third: best(counts, wants) for third, counts in givers.items()}
+    wanted_by = defaultdict(list)
+    for third, category, condition, want_count in TradeInterest.objects.filter(
+        user_id__in=list(givers), want_count__gt=0
+    ).values_list("user_id", "category", "condition", "want_count"):
+        get_key = third_gets[third]
+        wanted_by[category, condition].append(
+            (want_count + wants[get_key], third, get_key)
+        )
+    for candidates in wanted_by.values():
+        candidates.sort(reverse=True)
+        del candidates[settings.MATCHING_LIMIT :]
+
+    cycles = {}
+    for partner, partner_haves in taker_haves.items():
+        give_key = best(takers[partner])
+        for key in partner_haves & wanted_by.keys():
+            for weight, third, get_key in wanted_by[key]:
+                if third == partner:
+                    continue
+                score = (takers[partner][give_key] + weight) / 3 * CYCLE_WEIGHT
+                if score > cycles.get((partner, third), (0,))[0]:
+                    cycles[partner, third] = (
+                        score,
+                        SwapRecommendation.KindChoices.CYCLE,
+                        partner,
+                        third,
+                        give_key,
+                        get_key,
+                    )
+    matches.extend(cycles.values())
+    matches.sort(key=lambda match: (-match[0], match[2], match[3] or 0))
+    return matches
+
+
+def newest_ads(user_ids, keys):
+    # БД отдает по одному, самому новому, объявлению на (пользователь, ключ):
+    # объем выборки не зависит от числа объявлений пользователей
+    if not user_ids or not keys:
+        return {}
+    rows = (
+        Ad.objects.filter(key_q(keys), user_id__in=user_ids)
+        .annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=[F("user_id"), F("category"), F("condition")],
+                order_by=[F("created_at").desc(), F("id").desc()],
+            )
+        )
+        .filter(rank=1)
+        .values_list("pk", "user_id", "category", "condition")
+    )
+    return {
+        (owner, (category, condition)): pk for pk, owner, category, condition in rows
+    }
+
+
+def compute_recommendations(user_id):
+    matches = find_matches(user_id)[: settings.MATCHING_LIMIT * 2]
+    if not matches:
+        return []
+    own = newest_ads([user_id], {match[4] for match in matches})
+    theirs = newest_ads(
+        {match[3] or match[2] for match in matches}, {match[5] for match in matches}
+    )
+    recommendations = []
+    for score, kind, partner, third, give_key, get_key in matches:
+        # счетчики могут отставать от объявлений - такие совпадения пропускаем
+        give_ad = own.get((user_id, give_key))
+        get_ad = theirs.get((third or partner, get_key))
+        if give_ad is None or get_ad is None:
+            continue
+        recommendations.append(
+            SwapRecommendation(
+                user_id=user_id,
+                kind=kind,
+                give_ad_id=give_ad,
+                get_ad_id=get_ad,
+                partner_id=partner,
+                third_id=third,
+                score=score,
+            )
+        )
+    return recommendations[: settings.MATCHING_LIMIT]
+
+
+def refresh_recommendations(user_id, cascade=False):
+    """
+    Пересчитывает рекомендации пользователя. С cascade также ставит
+    в очередь пересчет тех, в чьих рекомендациях он участвует.
+    """
+    recommendations = compute_recommendations(user_id)
+    with transaction.atomic():
+        SwapRecommendation.objects.filter(user_id=user_id).delete()
+        SwapRecommendation.objects.bulk_create(recommendations)
+    cache.set(fresh_key(user_id), True, settings.MATCHING_TTL)
+    if cascade:
+        for other in (
+            SwapRecommendation.objects.filter(
+                Q(partner_id=user_id) | Q(third_id=user_id)
+            )
+            .values_list("user_id", flat=True)
+            .distinct()
+        ):
+            schedule_refresh(other)
+    return recommendations
+
+
+def schedule_refresh(user_id, cascade=False):
+    # Изменения пользователя за MATCHING_DELAY секунд сводятся в одну задачу
+    if cache.add(pending_key(user_id, cascade), True, settings.MATCHING_DELAY + 60):
+        jobs.enqueue(
+            "ads.refresh_recommendations",
+            delay=timedelta(seconds=settings.MATCHING_DELAY),
+            user_id=user_id,
+            cascade=cascade,
+        )
+
+
+def ensure_fresh(user_id):
+    """Ставит пересчет в очередь, если рекомендации старше MATCHING_TTL."""
+    if not cache.get(fresh_key(user_id)):
+        schedule_refresh(user_id)
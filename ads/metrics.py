@@ -0,0 +1,168 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar("ads_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса; заполняются из обертки SQL и бэкенда шаблонов."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает последнюю обертку
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_wrapper)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который учитывает время отрисовки страниц."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class Registry:
+    """Счетчики и гистограммы процесса в формате Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.counters = defaultdict(float)
+            self.buckets = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+            self.durations = defaultdict(float)
+
+    def observe(self, view, method, status, metrics, cache_result=None):
+        with self._lock:
+            self.requests[view, method, status] += 1
+            self.buckets[view][bisect_left(DURATION_BUCKETS, metrics.duration)] += 1
+            self.durations[view] += metrics.duration
+            self.counters["ads_db_queries_total", view] += metrics.queries
+            self.counters["ads_db_query_seconds_total", view] += metrics.query_time
+            self.counters[
+                "ads_template_render_seconds_total", view
+            ] += metrics.template_time
+            if cache_result is not None:
+                self.counters["ads_response_cache_total", view, cache_result] += 1
+
+    def render(self):
+        lines = ["# TYPE ads_requests_total counter"]
+        with self._lock:
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'ads_requests_total{{view="{view}",method="{method}",'
+                    f'status="{status}"}} {count}'
+                )
+            lines.append("# TYPE ads_request_duration_seconds histogram")
+            for view, counts in sorted(self.buckets.items()):
+                total = 0
+                for bound, count in zip((*DURATION_BUCKETS, "+Inf"), counts):
+                    total += count
+                    lines.append(
+                        f'ads_request_duration_seconds_bucket{{view="{view}",'
+                        f'le="{bound}"}} {total}'
+                    )
+                lines.append(
+                    f'ads_request_duration_seconds_sum{{view="{view}"}} '
+                    f"{self.durations[view]:.6f}"
+                )
+                lines.append(
+                    f'ads_request_duration_seconds_count{{view="{view}"}} {total}'
+                )
+            names = sorted({key[0] for key in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self.counters.items()):
+                    if key[0] != name:
+                        continue
+                    labels = f'view="{key[1]}"'
+                    if len(key) > 2:
+                        labels += f',result="{key[2]}"'
+                    lines.append(f"{name}{{{labels}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    # Без токена метрики открыты только в DEBUG
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,118 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from ads import metrics
+from ads.caching import response_cache_key
+
+logger = logging.getLogger("ads.performance")
+
+
+class PerformanceMiddleware:
+    """
+    Замеряет время ответа, число и время SQL-запросов, время отрисовки
+    шаблонов и попадания в кеш ответов. Отдает их в заголовке Server-Timing,
+    копит по представлениям для /metrics и пишет в лог запросы сверх бюджета.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.process(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.process(request, response, request_metrics)
+
+    def process(self, request, response, request_metrics):
+        request_metrics.finish()
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        cache_hit = getattr(request, "response_cache_hit", None)
+        cache_result = None if cache_hit is None else ("hit" if cache_hit else "miss")
+
+        metrics.registry.observe(
+            view, request.method, response.status_code, request_metrics, cache_result
+        )
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = server_timing(request_metrics, cache_result)
+        self.check_budget(request, view, request_metrics)
+        return response
+
+    def check_budget(self, request, view, request_metrics):
+        duration_ms = request_metrics.duration * 1000
+        if (
+            request_metrics.queries > settings.PERF_QUERY_BUDGET
+            or duration_ms > settings.PERF_LATENCY_BUDGET_MS
+        ):
+            logger.warning(
+                "Превышен бюджет: %s %s (%s) %.1f мс, %d SQL-запросов за %.1f мс",
+                request.method,
+                request.get_full_path(),
+                view,
+                duration_ms,
+                request_metrics.queries,
+                request_metrics.query_time * 1000,
+            )
+
+
+class ResponseCacheMiddleware:
+    """
+    Сохраняет ответы, отмеченные CachedResponseMixin. Стоит в начале
+    MIDDLEWARE: к нему ответ приходит отрисованным и с cookie сессии,
+    CSRF и сообщений, такие ответы в общий кеш не попадают.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        key = response_cache_key(request, response)
+        if key:
+            cache.set(key, response, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        key = response_cache_key(request, response)
+        if key:
+            await cache.aset(key, response, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+def server_timing(request_metrics, cache_result=None):
+    parts = [
+        f"app;dur={request_metrics.duration * 1000:.1f}",
+        f'db;dur={request_metrics.query_time * 1000:.1f};desc="{request_metrics.queries} queries"',
+        f"tpl;dur={request_metrics.template_time * 1000:.1f}",
+    ]
+    if cache_result:
+        parts.append(f'cache;desc="{cache_result}"')
+    return ", ".join(parts)
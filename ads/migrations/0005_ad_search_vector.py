@@ -0,0 +1,54 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=["search_vector"], name="ads_ad_search_vector_gin"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.add_index(apps.get_model("ads", "Ad"), SEARCH_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.remove_index(apps.get_model("ads", "Ad"), SEARCH_INDEX)
+
+
+def fill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from ads.search import build_search_vector
+
+    apps.get_model("ads", "Ad").objects.update(search_vector=build_search_vector())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0004_alter_exchangeproposal_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ad",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        # GIN-индекс есть только в PostgreSQL, на SQLite меняем лишь состояние
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="ad", index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
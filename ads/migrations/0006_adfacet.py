@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_facets(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    AdFacet = apps.get_model("ads", "AdFacet")
+    AdFacet.objects.bulk_create(
+        AdFacet(
+            category=row["category"],
+            condition=row["condition"],
+            ad_count=row["total"],
+        )
+        for row in Ad.objects.values("category", "condition").annotate(
+            total=Count("id")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0005_ad_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(max_length=100, verbose_name="Категория"),
+                ),
+                (
+                    "condition",
+                    models.CharField(
+                        choices=[("N", "Новый"), ("U", "Б/У")],
+                        max_length=1,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "ad_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Количество объявлений"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Счетчик категории",
+                "verbose_name_plural": "Счетчики категорий",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("category", "condition"), name="ads_adfacet_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0006_adfacet"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(fields=["-created_at", "-id"], name="ads_ad_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="ads_ad_category_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(
+                fields=["condition", "-created_at", "-id"],
+                name="ads_ad_condition_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="ads_ad_user_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(fields=["-created_at", "-id"], name="ads_ep_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"], name="ads_ep_status_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                condition=models.Q(("status", "A")),
+                fields=["ad_receiver"],
+                name="ads_ep_pending_receiver_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                condition=models.Q(("status", "A")),
+                fields=["ad_sender"],
+                name="ads_ep_pending_sender_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_owner_columns(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    ExchangeProposal = apps.get_model("ads", "ExchangeProposal")
+
+    def ad_owner(field):
+        return Subquery(Ad.objects.filter(pk=OuterRef(field)).values("user_id")[:1])
+
+    ExchangeProposal.objects.update(
+        sender_user_id=ad_owner("ad_sender_id"),
+        receiver_user_id=ad_owner("ad_receiver_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0007_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exchangeproposal",
+            name="receiver_user",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="received_proposals",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Получатель",
+            ),
+        ),
+        migrations.AddField(
+            model_name="exchangeproposal",
+            name="sender_user",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sent_proposals",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Отправитель",
+            ),
+        ),
+        migrations.RunPython(fill_owner_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                fields=["receiver_user", "-created_at", "-id"], name="ads_ep_inbox_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                fields=["sender_user", "-created_at", "-id"], name="ads_ep_outbox_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exchangeproposal",
+            index=models.Index(
+                condition=models.Q(("status", "A")),
+                fields=["receiver_user", "-created_at"],
+                name="ads_ep_inbox_pending_idx",
+            ),
+        ),
+    ]
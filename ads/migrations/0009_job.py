@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0008_exchangeproposal_owner_columns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Задача")),
+                ("payload", models.JSONField(default=dict, verbose_name="Параметры")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("P", "Ожидает"),
+                            ("R", "Выполняется"),
+                            ("F", "Ошибка"),
+                        ],
+                        default="P",
+                        max_length=1,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(default=0, verbose_name="Попытки"),
+                ),
+                (
+                    "max_attempts",
+                    models.PositiveSmallIntegerField(
+                        default=5, verbose_name="Максимум попыток"
+                    ),
+                ),
+                (
+                    "run_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Запуск после"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Последняя ошибка"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создана"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлена"),
+                ),
+            ],
+            options={
+                "verbose_name": "Фоновая задача",
+                "verbose_name_plural": "Фоновые задачи",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "P")),
+                        fields=["run_at"],
+                        name="ads_job_pending_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "R")),
+                        fields=["updated_at"],
+                        name="ads_job_running_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
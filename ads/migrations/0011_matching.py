@@ -0,0 +1,210 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_trade_interests(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    ExchangeProposal = apps.get_model("ads", "ExchangeProposal")
+    TradeInterest = apps.get_model("ads", "TradeInterest")
+    interests = {}
+    for row in (
+        Ad.objects.exclude(user=None)
+        .values("user_id", "category", "condition")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        key = (row["user_id"], row["category"], row["condition"])
+        interests.setdefault(key, [0, 0])[0] = row["total"]
+    for row in (
+        ExchangeProposal.objects.exclude(sender_user=None)
+        .values("sender_user_id", "ad_receiver__category", "ad_receiver__condition")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        key = (
+            row["sender_user_id"],
+            row["ad_receiver__category"],
+            row["ad_receiver__condition"],
+        )
+        interests.setdefault(key, [0, 0])[1] = row["total"]
+    TradeInterest.objects.bulk_create(
+        (
+            TradeInterest(
+                user_id=user_id,
+                category=category,
+                condition=condition,
+                has_count=has_count,
+                want_count=want_count,
+            )
+            for (user_id, category, condition), (has_count, want_count) in (
+                interests.items()
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0010_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SwapRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("D", "Прямой обмен"), ("C", "Обмен по цепочке")],
+                        max_length=1,
+                        verbose_name="Вид обмена",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Оценка")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Рассчитана"),
+                ),
+                (
+                    "get_ad",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ads.ad",
+                        verbose_name="Получает",
+                    ),
+                ),
+                (
+                    "give_ad",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ads.ad",
+                        verbose_name="Отдает",
+                    ),
+                ),
+                (
+                    "partner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Получатель объявления пользователя",
+                    ),
+                ),
+                (
+                    "third",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Третий участник цепочки",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="swap_recommendations",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Рекомендация обмена",
+                "verbose_name_plural": "Рекомендации обмена",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-score"], name="ads_swap_user_score_idx"
+                    ),
+                    models.Index(fields=["partner"], name="ads_swap_partner_idx"),
+                    models.Index(fields=["third"], name="ads_swap_third_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TradeInterest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(max_length=100, verbose_name="Категория"),
+                ),
+                (
+                    "condition",
+                    models.CharField(
+                        choices=[("N", "Новый"), ("U", "Б/У")],
+                        max_length=1,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "has_count",
+                    models.IntegerField(default=0, verbose_name="Есть объявлений"),
+                ),
+                (
+                    "want_count",
+                    models.IntegerField(default=0, verbose_name="Предложений на такие"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trade_interests",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Интерес к обмену",
+                "verbose_name_plural": "Интересы к обмену",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("want_count__gt", 0)),
+                        fields=["category", "condition", "-want_count"],
+                        name="ads_ti_wants_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("has_count__gt", 0)),
+                        fields=["category", "condition", "-has_count"],
+                        name="ads_ti_haves_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "category", "condition"),
+                        name="ads_tradeinterest_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_trade_interests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Ad = apps.get_model("ads", "Ad")
+    ExchangeProposal = apps.get_model("ads", "ExchangeProposal")
+    UserStats = apps.get_model("ads", "UserStats")
+    pending = ExchangeProposal.objects.filter(status="A")
+    counts = {}
+    for field, queryset, user_field in (
+        ("ad_count", Ad.objects.all(), "user_id"),
+        ("pending_incoming", pending, "receiver_user_id"),
+        ("pending_outgoing", pending, "sender_user_id"),
+    ):
+        for row in (
+            queryset.exclude(**{user_field: None})
+            .values(user_field)
+            .annotate(total=Count("id"))
+            .order_by()
+        ):
+            counts.setdefault(row[user_field], {})[field] = row["total"]
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id, **counts.get(user_id, {}))
+            for user_id in User.objects.values_list("pk", flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0011_matching"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                ("ad_count", models.IntegerField(default=0, verbose_name="Объявлений")),
+                (
+                    "pending_incoming",
+                    models.IntegerField(
+                        default=0, verbose_name="Входящих предложений ожидает"
+                    ),
+                ),
+                (
+                    "pending_outgoing",
+                    models.IntegerField(
+                        default=0, verbose_name="Исходящих предложений ожидает"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Счетчики пользователя",
+                "verbose_name_plural": "Счетчики пользователей",
+            },
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
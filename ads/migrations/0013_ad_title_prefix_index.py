@@ -0,0 +1,39 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions
+from django.db import migrations, models
+
+TITLE_PREFIX_INDEX = models.Index(
+    django.contrib.postgres.indexes.OpClass(
+        django.db.models.functions.Upper(
+            django.db.models.functions.Cast("title", models.TextField())
+        ),
+        name="text_pattern_ops",
+    ),
+    name="ads_ad_title_prefix_idx",
+)
+
+
+def create_title_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.add_index(apps.get_model("ads", "Ad"), TITLE_PREFIX_INDEX)
+
+
+def drop_title_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.remove_index(apps.get_model("ads", "Ad"), TITLE_PREFIX_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0012_user_stats"),
+    ]
+
+    operations = [
+        # Класс операторов text_pattern_ops есть только в PostgreSQL.
+        # Индекс не попадает в состояние модели: иначе SQLite падает
+        # при пересоздании таблицы ads_ad в следующих миграциях
+        migrations.RunPython(create_title_prefix_index, drop_title_prefix_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:51
+
+import os
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+# Размеры и имена превью на момент миграции, без импорта ads.images
+THUMBNAIL_SIZES = ("card", "detail")
+
+
+def has_thumbnails(name):
+    root, _ = os.path.splitext(name)
+    return all(
+        default_storage.exists(f"{root}.{size}-1x.jpg") for size in THUMBNAIL_SIZES
+    )
+
+
+def fill_has_thumbnails(apps, schema_editor):
+    # Флаг для фото, превью которых созданы до появления поля
+    Ad = apps.get_model("ads", "Ad")
+    names = (
+        Ad.objects.exclude(image_url="")
+        .exclude(image_url__isnull=True)
+        .values_list("image_url", flat=True)
+        .distinct()
+    )
+    ready = [name for name in names.iterator() if has_thumbnails(name)]
+    for start in range(0, len(ready), 1000):
+        Ad.objects.filter(image_url__in=ready[start : start + 1000]).update(
+            has_thumbnails=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0013_ad_title_prefix_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ad",
+            name="has_thumbnails",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="Превью готовы"
+            ),
+        ),
+        migrations.RunPython(fill_has_thumbnails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Должно совпадать с ads.search.build_search_vector
+CREATE_TRIGGER = """
+CREATE FUNCTION ads_ad_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', COALESCE(NEW.title, '')), 'A')
+        || setweight(to_tsvector('russian', COALESCE(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ads_ad_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, description ON ads_ad
+FOR EACH ROW EXECUTE FUNCTION ads_ad_search_vector_update();
+"""
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS ads_ad_search_vector_trigger ON ads_ad;
+DROP FUNCTION IF EXISTS ads_ad_search_vector_update();
+"""
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0014_ad_has_thumbnails"),
+    ]
+
+    operations = [
+        # Поисковый вектор считается в той же записи, без второго UPDATE
+        # после сохранения объявления
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 
 NULLABLE = {"blank": True, "null": True}
 
@@ -22,6 +25,10 @@ class Ad(models.Model):
         verbose_name="Описание объявления", help_text="Введите описание объявления"
     )
     image_url = models.ImageField(upload_to="media", **NULLABLE, verbose_name="Фото")
+    # Ставит задача ads.process_image, когда превью готовы
+    has_thumbnails = models.BooleanField(
+        default=False, editable=False, verbose_name="Превью готовы"
+    )
     category = models.CharField(
         max_length=100, verbose_name="Категория", help_text="Введите категорию"
     )
@@ -34,6 +41,10 @@ class Ad(models.Model):
     created_at = models.DateField(
         auto_now_add=True, verbose_name="Дата создания объявления", **NULLABLE
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name="Поисковый вектор"
+    )
 
     def __str__(self):
         return f"{self.title}"
@@ -41,6 +52,67 @@ class Ad(models.Model):
     class Meta:
         verbose_name = "Объявление"
         verbose_name_plural = "Объявления"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="ads_ad_search_vector_gin"),
+            # Списки объявлений: ORDER BY created_at DESC, id DESC
+            # без фильтра, с фильтром по категории, состоянию и автору
+            models.Index(fields=["-created_at", "-id"], name="ads_ad_recent_idx"),
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="ads_ad_category_recent_idx",
+            ),
+            models.Index(
+                fields=["condition", "-created_at", "-id"],
+                name="ads_ad_condition_recent_idx",
+            ),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="ads_ad_user_recent_idx"
+            ),
+            # Индекс подсказок по началу названия ads_ad_title_prefix_idx
+            # создает миграция 0013 только в PostgreSQL. В состоянии модели
+            # его нет: SQLite не знает text_pattern_ops и не смог бы
+            # пересоздать таблицу при следующих миграциях
+        ]
+
+
+class AdFacet(models.Model):
+    category = models.CharField(max_length=100, verbose_name="Категория")
+    condition = models.CharField(
+        max_length=1, choices=Ad.ConditionChoices.choices, verbose_name="Состояние"
+    )
+    ad_count = models.IntegerField(default=0, verbose_name="Количество объявлений")
+
+    def __str__(self):
+        return f"{self.category} ({self.get_condition_display()}) - {self.ad_count}"
+
+    class Meta:
+        verbose_name = "Счетчик категории"
+        verbose_name_plural = "Счетчики категорий"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "condition"], name="ads_adfacet_unique"
+            ),
+        ]
+
+
+class ExchangeProposalQuerySet(models.QuerySet):
+    def inbox(self, user):
+        return self.filter(receiver_user=user)
+
+    def outbox(self, user):
+        return self.filter(sender_user=user)
+
+    def for_user(self, user):
+        # UNION двух индексных выборок вместо OR по двум JOIN;
+        # подзапрос идет в ту же базу, что и сам queryset
+        manager = self.model._default_manager.db_manager(self.db)
+        ids = (
+            manager.inbox(user)
+            .order_by()
+            .values("pk")
+            .union(manager.outbox(user).order_by().values("pk"))
+        )
+        return self.filter(pk__in=ids)
 
 
 class ExchangeProposal(models.Model):
@@ -64,6 +136,22 @@ class ExchangeProposal(models.Model):
         help_text="Выберете объявление на которое хотите обменяться",
         related_name="you_receive",
     )
+    sender_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        editable=False,
+        related_name="sent_proposals",
+        verbose_name="Отправитель",
+        **NULLABLE,
+    )
+    receiver_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        editable=False,
+        related_name="received_proposals",
+        verbose_name="Получатель",
+        **NULLABLE,
+    )
     comment = models.TextField(
         verbose_name="комментарий",
         help_text="Напишите комментарий к предложению обмена",
@@ -77,10 +165,223 @@ class ExchangeProposal(models.Model):
     created_at = models.DateField(
         auto_now_add=True, verbose_name="Дата предложения", **NULLABLE
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    objects = ExchangeProposalQuerySet.as_manager()
 
     def __str__(self):
         return f"Предложение сделки номер - {self.id}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"ad_sender", "ad_receiver"} & set(update_fields):
+            self.sender_user_id = self.ad_sender.user_id
+            self.receiver_user_id = self.ad_receiver.user_id
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "sender_user",
+                    "receiver_user",
+                }
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Сделка"
         verbose_name_plural = "Сделки"
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="ads_ep_recent_idx"),
+            models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="ads_ep_status_recent_idx",
+            ),
+            # Входящие и исходящие предложения пользователя
+            models.Index(
+                fields=["receiver_user", "-created_at", "-id"],
+                name="ads_ep_inbox_idx",
+            ),
+            models.Index(
+                fields=["sender_user", "-created_at", "-id"],
+                name="ads_ep_outbox_idx",
+            ),
+            models.Index(
+                fields=["receiver_user", "-created_at"],
+                condition=models.Q(status="A"),
+                name="ads_ep_inbox_pending_idx",
+            ),
+            # Ожидающие предложения по объявлению - частичные индексы
+            models.Index(
+                fields=["ad_receiver"],
+                condition=models.Q(status="A"),
+                name="ads_ep_pending_receiver_idx",
+            ),
+            models.Index(
+                fields=["ad_sender"],
+                condition=models.Q(status="A"),
+                name="ads_ep_pending_sender_idx",
+            ),
+        ]
+
+
+class Job(models.Model):
+    class StatusChoices(models.TextChoices):
+        PENDING = "P", "Ожидает"
+        RUNNING = "R", "Выполняется"
+        FAILED = "F", "Ошибка"
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, verbose_name="Параметры")
+    status = models.CharField(
+        max_length=1,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name="Статус",
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попытки")
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, verbose_name="Максимум попыток"
+    )
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Запуск после")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(
+                fields=["run_at"],
+                condition=models.Q(status="P"),
+                name="ads_job_pending_idx",
+            ),
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(status="R"),
+                name="ads_job_running_idx",
+            ),
+        ]
+
+
+class TradeInterest(models.Model):
+    """
+    Граф «есть/нужно» для подбора обменов: сколько объявлений пользователя
+    в категории и состоянии (has) и сколько его предложений на такие
+    объявления (want).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="trade_interests",
+        verbose_name="Пользователь",
+    )
+    category = models.CharField(max_length=100, verbose_name="Категория")
+    condition = models.CharField(
+        max_length=1, choices=Ad.ConditionChoices.choices, verbose_name="Состояние"
+    )
+    has_count = models.IntegerField(default=0, verbose_name="Есть объявлений")
+    want_count = models.IntegerField(default=0, verbose_name="Предложений на такие")
+
+    def __str__(self):
+        return f"{self.user_id}: {self.category} ({self.condition})"
+
+    class Meta:
+        verbose_name = "Интерес к обмену"
+        verbose_name_plural = "Интересы к обмену"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category", "condition"],
+                name="ads_tradeinterest_unique",
+            ),
+        ]
+        indexes = [
+            # Кто ищет / кто предлагает вещи данной категории
+            models.Index(
+                fields=["category", "condition", "-want_count"],
+                condition=models.Q(want_count__gt=0),
+                name="ads_ti_wants_idx",
+            ),
+            models.Index(
+                fields=["category", "condition", "-has_count"],
+                condition=models.Q(has_count__gt=0),
+                name="ads_ti_haves_idx",
+            ),
+        ]
+
+
+class SwapRecommendation(models.Model):
+    class KindChoices(models.TextChoices):
+        DIRECT = "D", "Прямой обмен"
+        CYCLE = "C", "Обмен по цепочке"
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="swap_recommendations",
+        verbose_name="Пользователь",
+    )
+    kind = models.CharField(
+        max_length=1, choices=KindChoices.choices, verbose_name="Вид обмена"
+    )
+    give_ad = models.ForeignKey(
+        Ad, on_delete=models.CASCADE, related_name="+", verbose_name="Отдает"
+    )
+    get_ad = models.ForeignKey(
+        Ad, on_delete=models.CASCADE, related_name="+", verbose_name="Получает"
+    )
+    partner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Получатель объявления пользователя",
+    )
+    third = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Третий участник цепочки",
+        **NULLABLE,
+    )
+    score = models.FloatField(verbose_name="Оценка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Рассчитана")
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.give_ad_id} -> {self.get_ad_id}"
+
+    class Meta:
+        verbose_name = "Рекомендация обмена"
+        verbose_name_plural = "Рекомендации обмена"
+        indexes = [
+            models.Index(fields=["user", "-score"], name="ads_swap_user_score_idx"),
+            models.Index(fields=["partner"], name="ads_swap_partner_idx"),
+            models.Index(fields=["third"], name="ads_swap_third_idx"),
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя для меню: обновляются сигналами и сервисами."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь",
+    )
+    ad_count = models.IntegerField(default=0, verbose_name="Объявлений")
+    pending_incoming = models.IntegerField(
+        default=0, verbose_name="Входящих предложений ожидает"
+    )
+    pending_outgoing = models.IntegerField(
+        default=0, verbose_name="Исходящих предложений ожидает"
+    )
+
+    def __str__(self):
+        return f"Счетчики пользователя {self.user_id}"
+
+    class Meta:
+        verbose_name = "Счетчики пользователя"
+        verbose_name_plural = "Счетчики пользователей"
@@ -0,0 +1,185 @@
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL вместо COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def aestimate_count(queryset):
+    if connections[queryset.db].vendor != "postgresql":
+        return await queryset.acount()
+    return await sync_to_async(estimate_count)(queryset)
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+async def aget_page(paginator, number):
+    """
+    Асинхронный Paginator.get_page: количество и строки страницы читаются
+    async ORM, дальше страница работает без обращений к БД.
+    """
+    if "count" not in paginator.__dict__:
+        if isinstance(paginator, EstimatedCountPaginator):
+            count = await aestimate_count(paginator.object_list)
+        else:
+            count = await paginator.object_list.acount()
+        paginator.__dict__["count"] = count
+    page = paginator.get_page(number)
+    page.object_list = [obj async for obj in page.object_list]
+    return page
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<CursorPage ({len(self.object_list)} objects)>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по (created_at, id): страница выбирается условием
+    WHERE по последней показанной строке, без OFFSET и без COUNT(*).
+    """
+
+    def __init__(
+        self, object_list, per_page, ordering=("-created_at", "-id"), estimate=False
+    ):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if self.estimate:
+            return estimate_count(self.object_list)
+        return self.object_list.count()
+
+    def encode_cursor(self, obj, reverse=False):
+        position = [getattr(obj, field.lstrip("-")) for field in self.ordering]
+        payload = json.dumps({"p": position, "r": reverse}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            position, reverse = payload["p"], payload["r"]
+        except (TypeError, ValueError, KeyError):
+            return None, False
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+            or not isinstance(reverse, bool)
+        ):
+            return None, False
+        # Значения курсора приходят от клиента: приводятся к типам полей,
+        # иначе подделанный курсор дает ошибку в фильтре
+        opts = self.object_list.model._meta
+        try:
+            position = [
+                opts.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None, False
+        if None in position:
+            return None, False
+        return position, reverse
+
+    def _after(self, position, reverse):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            clause = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                clause &= Q(**{previous.lstrip("-"): value})
+            condition |= clause
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def page_queryset(self, cursor):
+        position, reverse = self.decode_cursor(cursor) if cursor else (None, False)
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+        ordering = self._reversed_ordering() if reverse else self.ordering
+        return queryset.order_by(*ordering)[: self.per_page + 1], position, reverse
+
+    def page(self, cursor=None):
+        queryset, position, reverse = self.page_queryset(cursor)
+        return self._make_page(list(queryset), position, reverse)
+
+    async def apage(self, cursor=None):
+        queryset, position, reverse = self.page_queryset(cursor)
+        return self._make_page([obj async for obj in queryset], position, reverse)
+
+    def _make_page(self, rows, position, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,16 @@
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+
+
+def get_owned(queryset, pk, user, owner_field="user_id"):
+    """
+    Загружает объект и проверяет владельца одним запросом: сравнивается
+    значение внешнего ключа, связанные строки не загружаются.
+    Возвращает (объект, None) или (объект либо None, NOT_FOUND/FORBIDDEN).
+    """
+    obj = queryset.filter(pk=pk).first()
+    if obj is None:
+        return None, NOT_FOUND
+    if getattr(obj, owner_field) != user.pk:
+        return obj, FORBIDDEN
+    return obj, None
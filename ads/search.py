@@ -0,0 +1,213 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils.module_loading import import_string
+
+SEARCH_CONFIG = "russian"
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def build_search_vector():
+    return SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+        "description", weight="B", config=SEARCH_CONFIG
+    )
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, ad):
+        pass
+
+    def index_many(self, ads):
+        for ad in ads:
+            self.index(ad)
+
+    def remove(self, ad_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Поиск по tsvector-колонке Ad.search_vector с GIN-индексом. Колонку
+    заполняет триггер из миграции 0015 в той же записи, что и INSERT/UPDATE
+    объявления, поэтому index() ничего не делает.
+    """
+
+    def build_query(self, query):
+        # Префиксный поиск по каждому слову: "вел мал" -> "вел:* & мал:*"
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        raw = " & ".join(f"{token}:*" for token in tokens)
+        return SearchQuery(raw, config=SEARCH_CONFIG, search_type="raw")
+
+    def search(self, queryset, query):
+        search_query = self.build_query(query)
+        if search_query is None:
+            return queryset
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-created_at", "-id")
+        )
+
+    def index_many(self, ads):
+        from ads.models import Ad
+
+        Ad.objects.filter(pk__in=[ad.pk for ad in ads]).update(
+            search_vector=build_search_vector()
+        )
+
+    def rebuild(self):
+        from ads.models import Ad
+
+        Ad.objects.update(search_vector=build_search_vector())
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """Инвертированный индекс в памяти процесса для SQLite и тестов."""
+
+    field_weights = {"title": 1.0, "description": 0.4}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        from ads.models import Ad
+
+        with self._lock:
+            if self._loaded:
+                return
+            for ad_id, title, description in Ad.objects.values_list(
+                "id", "title", "description"
+            ).iterator():
+                self._add(ad_id, title, description)
+            self._loaded = True
+
+    def _add(self, ad_id, title, description):
+        self._discard(ad_id)
+        scores = defaultdict(float)
+        for field, text in (("title", title), ("description", description)):
+            for token in tokenize(text):
+                scores[token] += self.field_weights[field]
+        for token, score in scores.items():
+            if token not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[token][ad_id] = score
+        self._documents[ad_id] = set(scores)
+
+    def _discard(self, ad_id):
+        for token in self._documents.pop(ad_id, ()):
+            postings = self._postings[token]
+            postings.pop(ad_id, None)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary_dirty = True
+
+    def _expand(self, prefix):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[
+            position
+        ].startswith(prefix):
+            yield self._vocabulary[position]
+            position += 1
+
+    def rank(self, query):
+        self._ensure_loaded()
+        ranking = None
+        with self._lock:
+            for prefix in tokenize(query):
+                scores = defaultdict(float)
+                for token in self._expand(prefix):
+                    for ad_id, score in self._postings[token].items():
+                        scores[ad_id] += score
+                if ranking is None:
+                    ranking = scores
+                else:
+                    ranking = {
+                        ad_id: ranking[ad_id] + score
+                        for ad_id, score in scores.items()
+                        if ad_id in ranking
+                    }
+                if not ranking:
+                    return {}
+        return ranking or {}
+
+    def search(self, queryset, query):
+        if not tokenize(query):
+            return queryset
+        ranking = self.rank(query)
+        if not ranking:
+            return queryset.none()
+        return (
+            queryset.filter(pk__in=ranking)
+            .annotate(
+                rank=Case(
+                    *[
+                        When(pk=ad_id, then=Value(score))
+                        for ad_id, score in ranking.items()
+                    ],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-rank", "-created_at", "-id")
+        )
+
+    def index(self, ad):
+        if not self._loaded:
+            return
+        with self._lock:
+            self._add(ad.pk, ad.title, ad.description)
+
+    def remove(self, ad_id):
+        with self._lock:
+            self._discard(ad_id)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._vocabulary_dirty = True
+            self._loaded = False
+        self._ensure_loaded()
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "SEARCH_BACKEND", None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == "postgresql":
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = InvertedIndexBackend()
+    return _backend
@@ -0,0 +1,370 @@
+import io
+import random
+from functools import partial
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from ads.caching import bump_listing_version
+from ads.facets import rebuild_facets
+from ads.matching import rebuild_interests
+from ads.models import Ad, ExchangeProposal
+from ads.search import get_search_backend
+from ads.stats import reconcile
+
+BATCH_SIZE = 10000
+HISTORY_DAYS = 730
+# Даты отсчитываются от фиксированного момента, а не от дня запуска:
+# одинаковый seed дает одинаковые данные в любой день
+SEED_EPOCH = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+# Категория: (доля объявлений, предметы)
+CATEGORIES = {
+    "Электроника": (
+        22,
+        ("Смартфон", "Ноутбук", "Планшет", "Наушники", "Телевизор", "Фотоаппарат"),
+    ),
+    "Одежда": (18, ("Куртка", "Пальто", "Платье", "Джинсы", "Кроссовки", "Свитер")),
+    "Детские товары": (
+        14,
+        ("Коляска", "Автокресло", "Конструктор", "Детская кроватка", "Самокат"),
+    ),
+    "Дом и сад": (12, ("Диван", "Стол", "Кресло", "Шкаф", "Торшер", "Газонокосилка")),
+    "Спорт": (10, ("Велосипед", "Лыжи", "Гантели", "Палатка", "Ролики")),
+    "Книги": (9, ("Роман", "Учебник", "Энциклопедия", "Сборник стихов", "Комикс")),
+    "Хобби": (8, ("Гитара", "Пазл", "Набор для рисования", "Настольная игра")),
+    "Животные": (4, ("Переноска", "Аквариум", "Когтеточка", "Лежанка")),
+    "Авто": (3, ("Комплект шин", "Видеорегистратор", "Автомагнитола")),
+}
+# Б/У вещей на площадке обмена больше, чем новых
+CONDITIONS = {Ad.ConditionChoices.USED: 65, Ad.ConditionChoices.NEW: 35}
+STATUSES = {
+    ExchangeProposal.ExchangeChoices.AWAITS: 60,
+    ExchangeProposal.ExchangeChoices.REJECTED: 25,
+    ExchangeProposal.ExchangeChoices.TAKEN: 15,
+}
+TITLE_DETAILS = (
+    "в хорошем состоянии",
+    "в отличном состоянии",
+    "без дефектов",
+    "в коробке",
+    "с документами",
+    "срочно",
+    "недорого",
+    "для дома",
+)
+DESCRIPTION_SENTENCES = (
+    "Использовался аккуратно.",
+    "Есть небольшие следы использования.",
+    "Покупал около года назад.",
+    "Самовывоз из центра города.",
+    "Рассмотрю любые варианты обмена.",
+    "Фото по запросу.",
+    "Подойдет для подарка.",
+    "Все работает, проверено.",
+    "Отдаю, потому что переезжаю.",
+    "Хранился в сухом помещении.",
+)
+COMMENTS = (
+    "Предлагаю обмен, могу доплатить.",
+    "Интересует ваша вещь, посмотрите мое объявление.",
+    "Готов встретиться в удобное для вас время.",
+    "Давно ищу такую, давайте меняться.",
+)
+FIRST_NAMES = ("Александр", "Мария", "Дмитрий", "Анна", "Сергей", "Елена", "Иван")
+LAST_NAMES = ("Иванов", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев")
+
+USER_COLUMNS = (
+    "id",
+    "password",
+    "is_superuser",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_staff",
+    "is_active",
+    "date_joined",
+)
+AD_COLUMNS = (
+    "id",
+    "user_id",
+    "title",
+    "description",
+    "category",
+    "condition",
+    "created_at",
+    "updated_at",
+    "has_thumbnails",
+)
+PROPOSAL_COLUMNS = (
+    "id",
+    "ad_sender_id",
+    "ad_receiver_id",
+    "sender_user_id",
+    "receiver_user_id",
+    "comment",
+    "status",
+    "created_at",
+    "updated_at",
+)
+
+
+def weighted(rng, weights):
+    population = list(weights)
+    cumulative = []
+    total = 0
+    for weight in weights.values():
+        total += weight
+        cumulative.append(total)
+    return lambda: rng.choices(population, cum_weights=cumulative)[0]
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def copy_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(model, columns, rows):
+    """COPY ... FROM STDIN: в PostgreSQL в разы быстрее вставки по строкам."""
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            with cursor.cursor.copy(f"COPY {table} ({names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(map(copy_value, row)))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.cursor.copy_expert(
+            f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+
+def insert_rows(model, columns, rows):
+    db = connections[DEFAULT_DB_ALIAS]
+    fields = [model._meta.get_field(column) for column in columns]
+    # Преобразуются только даты: остальные значения драйвер принимает как есть
+    converters = [
+        (
+            partial(field.get_db_prep_save, connection=db)
+            if isinstance(field, models.DateField)
+            else None
+        )
+        for field in fields
+    ]
+    table = db.ops.quote_name(model._meta.db_table)
+    names = ", ".join(db.ops.quote_name(field.column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    with db.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({placeholders})",
+            [
+                [
+                    convert(value) if convert else value
+                    for convert, value in zip(converters, row)
+                ]
+                for row in rows
+            ],
+        )
+
+
+def write_rows(model, columns, rows, batch_size, progress=None):
+    write = copy_rows if connection.vendor == "postgresql" else insert_rows
+    written = 0
+    for batch in batches(rows, batch_size):
+        # Пачка - отдельная транзакция: загрузка не держит одну транзакцию
+        # на миллионы строк
+        with transaction.atomic():
+            write(model, columns, batch)
+        written += len(batch)
+        if progress:
+            progress(model, written)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+class Generator:
+    """Детерминированный генератор строк: одинаковый seed - одинаковые данные."""
+
+    def __init__(self, seed=0, now=None):
+        self.rng = random.Random(seed)
+        self.now = now or SEED_EPOCH
+        self.category = weighted(
+            self.rng, {category: weight for category, (weight, _) in CATEGORIES.items()}
+        )
+        self.condition = weighted(self.rng, CONDITIONS)
+        self.status = weighted(self.rng, STATUSES)
+        self.timezone = timezone.get_current_timezone()
+
+    def moment(self, days=HISTORY_DAYS):
+        return self.now - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def users(self, ids, prefix):
+        for user_id in ids:
+            username = f"{prefix}_{user_id}"
+            yield (
+                user_id,
+                f"{UNUSABLE_PASSWORD_PREFIX}{prefix}",
+                False,
+                username,
+                self.rng.choice(FIRST_NAMES),
+                self.rng.choice(LAST_NAMES),
+                f"{username}@example.ru",
+                False,
+                True,
+                self.moment(),
+            )
+
+    def ads(self, ids, user_ids, owners):
+        for ad_id in ids:
+            category = self.category()
+            user_id = self.rng.choice(user_ids)
+            owners.append(user_id)
+            updated_at = self.moment()
+            yield (
+                ad_id,
+                user_id,
+                f"{self.rng.choice(CATEGORIES[category][1])} "
+                f"{self.rng.choice(TITLE_DETAILS)}",
+                " ".join(
+                    self.rng.sample(DESCRIPTION_SENTENCES, self.rng.randint(2, 4))
+                ),
+                category,
+                self.condition(),
+                updated_at.astimezone(self.timezone).date(),
+                updated_at,
+                False,
+            )
+
+    def proposals(self, ids, ad_ids, owners):
+        if len(set(owners)) < 2:
+            return
+        ids = iter(ids)
+        while True:
+            sender = self.rng.randrange(len(ad_ids))
+            receiver = self.rng.randrange(len(ad_ids))
+            if owners[sender] == owners[receiver]:
+                continue
+            proposal_id = next(ids, None)
+            if proposal_id is None:
+                return
+            updated_at = self.moment(days=90)
+            yield (
+                proposal_id,
+                ad_ids[sender],
+                ad_ids[receiver],
+                owners[sender],
+                owners[receiver],
+                self.rng.choice(COMMENTS),
+                self.status(),
+                updated_at.astimezone(self.timezone).date(),
+                updated_at,
+            )
+
+
+def seed(
+    users,
+    ads,
+    proposals,
+    seed=0,
+    batch_size=BATCH_SIZE,
+    prefix="seed",
+    progress=None,
+    now=None,
+):
+    """
+    Заполняет БД синтетическими пользователями, объявлениями и предложениями
+    пачками через COPY (PostgreSQL) или многострочный INSERT. Первичные ключи
+    назначаются заранее, поэтому строки не возвращаются из БД и память
+    не растет с объемом. Каждая пачка коммитится отдельно, при сбое
+    загруженные пачки остаются. Даты - за HISTORY_DAYS до now (по умолчанию
+    SEED_EPOCH). Возвращает диапазоны pk созданных строк.
+    """
+    generator = Generator(seed, now)
+    start = next_id(User)
+    user_ids = range(start, start + users)
+    write_rows(
+        User,
+        USER_COLUMNS,
+        generator.users(user_ids, prefix),
+        batch_size,
+        progress,
+    )
+
+    start = next_id(Ad)
+    ad_ids = range(start, start + ads)
+    owners = array("q")
+    if user_ids:
+        write_rows(
+            Ad,
+            AD_COLUMNS,
+            generator.ads(ad_ids, user_ids, owners),
+            batch_size,
+            progress,
+        )
+    else:
+        ad_ids = range(0)
+
+    start = next_id(ExchangeProposal)
+    proposal_ids = range(start, start + proposals)
+    write_rows(
+        ExchangeProposal,
+        PROPOSAL_COLUMNS,
+        generator.proposals(proposal_ids, ad_ids, owners),
+        batch_size,
+        progress,
+    )
+    proposal_ids = range(start, next_id(ExchangeProposal))
+
+    # Явные pk не двигают последовательности PostgreSQL
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [User, Ad, ExchangeProposal]
+        ):
+            cursor.execute(sql)
+
+    # Строки вставлены в обход ORM: счетчики, индекс и кеш списков
+    # пересобираются один раз после загрузки, вне транзакций пачек
+    rebuild_derived()
+    return user_ids, ad_ids, proposal_ids
+
+
+def rebuild_derived():
+    """
+    Пересобирает счетчики, поисковый индекс и кеш списков после вставки
+    строк в обход ORM (без сигналов).
+    """
+    rebuild_facets()
+    rebuild_interests()
+    reconcile()
+    get_search_backend().rebuild()
+    bump_listing_version()
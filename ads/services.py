@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ads import events, permissions, stats
+from ads.models import Ad, ExchangeProposal
+
+AWAITS = ExchangeProposal.ExchangeChoices.AWAITS
+TAKEN = ExchangeProposal.ExchangeChoices.TAKEN
+REJECTED = ExchangeProposal.ExchangeChoices.REJECTED
+
+
+class TransitionResult:
+    APPLIED = "applied"
+    NOT_FOUND = permissions.NOT_FOUND
+    FORBIDDEN = permissions.FORBIDDEN
+    CONFLICT = "conflict"
+
+    def __init__(self, outcome, proposal=None, auto_rejected=()):
+        self.outcome = outcome
+        self.proposal = proposal
+        self.auto_rejected = list(auto_rejected)
+
+    def __repr__(self):
+        return f"<TransitionResult {self.outcome}>"
+
+    @property
+    def applied(self):
+        return self.outcome == self.APPLIED
+
+
+def get_receiver_proposal(proposal_id, user):
+    proposal, outcome = permissions.get_owned(
+        ExchangeProposal.objects, proposal_id, user, "receiver_user_id"
+    )
+    if outcome:
+        return None, TransitionResult(outcome, proposal)
+    return proposal, None
+
+
+def publish_status(proposal):
+    # UPDATE не вызывает post_save, поэтому событие отправляется здесь
+    events.publish(
+        events.proposal_event(
+            "proposal.status",
+            proposal.pk,
+            proposal.status,
+            proposal.sender_user_id,
+            proposal.receiver_user_id,
+        )
+    )
+
+
+def pending_for_ads(ad_ids):
+    return ExchangeProposal.objects.filter(status=AWAITS).filter(
+        Q(ad_sender_id__in=ad_ids) | Q(ad_receiver_id__in=ad_ids)
+    )
+
+
+@transaction.atomic
+def accept_proposal(proposal_id, user):
+    """
+    Принимает предложение и отклоняет остальные ожидающие предложения
+    с участием тех же объявлений. Статус меняется условным UPDATE ... WHERE
+    status='A', поэтому из двух одновременных запросов проходит один.
+    """
+    proposal, error = get_receiver_proposal(proposal_id, user)
+    if error:
+        return error
+
+    # Блокировка обоих объявлений в порядке pk: конкурирующие принятия
+    # с общим объявлением выполняются по очереди и без взаимоблокировок
+    ad_ids = sorted({proposal.ad_sender_id, proposal.ad_receiver_id})
+    list(
+        Ad.objects.select_for_update()
+        .filter(pk__in=ad_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    now = timezone.now()
+    updated = ExchangeProposal.objects.filter(pk=proposal.pk, status=AWAITS).update(
+        status=TAKEN, updated_at=now
+    )
+    if not updated:
+        proposal.refresh_from_db(fields=["status", "updated_at"])
+        return TransitionResult(TransitionResult.CONFLICT, proposal)
+
+    # блокировка строк: параллельное отклонение не изменит их до коммита,
+    # и счетчики ожидающих уменьшаются ровно для обновленных предложений
+    others = list(
+        pending_for_ads(ad_ids)
+        .exclude(pk=proposal.pk)
+        .select_for_update()
+        .values_list("pk", "sender_user_id", "receiver_user_id")
+    )
+    auto_rejected = [pk for pk, _, _ in others]
+    if auto_rejected:
+        ExchangeProposal.objects.filter(pk__in=auto_rejected, status=AWAITS).update(
+            status=REJECTED, updated_at=now
+        )
+    proposal.status, proposal.updated_at = TAKEN, now
+    # UPDATE не вызывает сигналы: счетчики ожидающих обновляются здесь
+    stats.proposals_closed(
+        [
+            (proposal.sender_user_id, proposal.receiver_user_id),
+            *((sender, receiver) for _, sender, receiver in others),
+        ]
+    )
+    publish_status(proposal)
+    for pk, sender_user_id, receiver_user_id in others:
+        events.publish(
+            events.proposal_event(
+                "proposal.status", pk, REJECTED, sender_user_id, receiver_user_id
+            )
+        )
+    return TransitionResult(TransitionResult.APPLIED, proposal, auto_rejected)
+
+
+@transaction.atomic
+def reject_proposal(proposal_id, user):
+    proposal, error = get_receiver_proposal(proposal_id, user)
+    if error:
+        return error
+
+    now = timezone.now()
+    updated = ExchangeProposal.objects.filter(pk=proposal.pk, status=AWAITS).update(
+        status=REJECTED, updated_at=now
+    )
+    if not updated:
+        proposal.refresh_from_db(fields=["status", "updated_at"])
+        return TransitionResult(TransitionResult.CONFLICT, proposal)
+    proposal.status, proposal.updated_at = REJECTED, now
+    stats.proposals_closed([(proposal.sender_user_id, proposal.receiver_user_id)])
+    publish_status(proposal)
+    return TransitionResult(TransitionResult.APPLIED, proposal)
@@ -0,0 +1,197 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from ads import events, facets, jobs, matching, stats
+from ads.caching import bump_listing_version
+from ads.models import Ad, ExchangeProposal
+from ads.search import get_search_backend
+
+
+def image_name(value):
+    return getattr(value, "name", value) or None
+
+
+@receiver(pre_delete, sender=User)
+def remember_deleted_user(sender, instance, origin=None, **kwargs):
+    # pre_delete приходит для всех строк каскада до первого DELETE
+    if origin is not None:
+        if not hasattr(origin, "_deleted_user_ids"):
+            origin._deleted_user_ids = set()
+        origin._deleted_user_ids.add(instance.pk)
+
+
+def deleted_users(origin):
+    """
+    id пользователей, удаление которых вызвало каскад. Их строки счетчиков
+    удаляются тем же каскадом, и изменения для них пересоздали бы строки
+    со ссылкой на удаленного пользователя.
+    """
+    return getattr(origin, "_deleted_user_ids", set())
+
+
+@receiver(post_init, sender=Ad)
+def remember_state(sender, instance, **kwargs):
+    instance._facet_key = facets.facet_key(instance)
+    instance._loaded_user_id = instance.__dict__.get("user_id")
+    instance._loaded_image = image_name(instance.__dict__.get("image_url"))
+
+
+@receiver(pre_save, sender=Ad)
+def load_previous_facet(sender, instance, **kwargs):
+    if instance._facet_key is None and instance.pk and not instance._state.adding:
+        instance._facet_key = (
+            Ad.objects.filter(pk=instance.pk)
+            .values_list("category", "condition")
+            .first()
+        )
+
+
+@receiver(pre_delete, sender=Ad)
+def load_deleted_state(sender, instance, **kwargs):
+    # После DELETE отложенные поля уже не прочитать: счетчикам нужны
+    # категория, состояние и владелец удаляемого объявления
+    if instance._facet_key is not None and "user_id" in instance.__dict__:
+        return
+    row = (
+        Ad.objects.filter(pk=instance.pk)
+        .values_list("category", "condition", "user_id")
+        .first()
+    )
+    if row is not None:
+        instance._facet_key = row[:2]
+        instance._loaded_user_id = row[2]
+
+
+@receiver(post_save, sender=Ad)
+def index_ad(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"title", "description"} & set(update_fields):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_save, sender=Ad)
+def track_trade_interest(sender, instance, created, **kwargs):
+    # до count_ad и sync_proposal_owners, которые обновляют запомненное состояние
+    matching.ad_saved(instance, created, instance._loaded_user_id, instance._facet_key)
+
+
+@receiver(post_save, sender=Ad)
+def count_ad(sender, instance, created, **kwargs):
+    facets.ad_saved(instance, created, instance._facet_key)
+    stats.ad_saved(instance, created)
+    instance._facet_key = facets.facet_key(instance)
+
+
+@receiver(post_save, sender=Ad)
+def sync_proposal_owners(sender, instance, created, **kwargs):
+    # Владелец объявления продублирован в ExchangeProposal.sender_user/receiver_user
+    if created or instance._loaded_user_id == instance.user_id:
+        return
+    ExchangeProposal.objects.filter(ad_sender=instance).update(
+        sender_user=instance.user_id
+    )
+    ExchangeProposal.objects.filter(ad_receiver=instance).update(
+        receiver_user=instance.user_id
+    )
+    # объявление и его предложения переходят к другому пользователю
+    stats.reconcile([instance._loaded_user_id, instance.user_id])
+    instance._loaded_user_id = instance.user_id
+
+
+@receiver(pre_save, sender=Ad)
+def reset_thumbnails(sender, instance, **kwargs):
+    # превью нового фото появятся только после задачи ads.process_image
+    if "image_url" in instance.__dict__ and instance._loaded_image != image_name(
+        instance.image_url
+    ):
+        instance.has_thumbnails = False
+
+
+@receiver(post_save, sender=Ad)
+def process_image(sender, instance, **kwargs):
+    if "image_url" not in instance.__dict__:
+        return
+    previous, current = instance._loaded_image, image_name(instance.image_url)
+    if previous == current:
+        return
+    # Декодирование и ресайз фото выполняет воркер, а не запрос
+    jobs.enqueue("ads.process_image", name=current, previous=previous)
+    instance._loaded_image = current
+
+
+@receiver(post_save, sender=Ad)
+@receiver(post_delete, sender=Ad)
+def invalidate_listing_pages(sender, **kwargs):
+    bump_listing_version()
+
+
+@receiver(post_delete, sender=Ad)
+def unindex_ad(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_delete, sender=Ad)
+def uncount_ad(sender, instance, origin=None, **kwargs):
+    facets.ad_deleted(instance, instance._facet_key)
+    if instance._loaded_user_id in deleted_users(origin):
+        return
+    stats.ad_deleted(instance, instance._loaded_user_id)
+    matching.ad_deleted(instance, instance._loaded_user_id, instance._facet_key)
+
+
+@receiver(post_delete, sender=Ad)
+def delete_image_derivatives(sender, instance, **kwargs):
+    if instance._loaded_image:
+        jobs.enqueue("ads.delete_image_derivatives", name=instance._loaded_image)
+
+
+@receiver(post_init, sender=ExchangeProposal)
+def remember_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get("status")
+    instance._loaded_users = (
+        instance.__dict__.get("sender_user_id"),
+        instance.__dict__.get("receiver_user_id"),
+    )
+
+
+@receiver(post_save, sender=ExchangeProposal)
+def count_proposal(sender, instance, created, **kwargs):
+    # до publish_proposal_event, который обновляет запомненный статус
+    stats.proposal_saved(
+        instance, created, instance._loaded_status, instance._loaded_users
+    )
+    instance._loaded_users = (instance.sender_user_id, instance.receiver_user_id)
+
+
+@receiver(post_delete, sender=ExchangeProposal)
+def uncount_proposal(sender, instance, origin=None, **kwargs):
+    stats.proposal_deleted(instance, deleted_users(origin))
+
+
+@receiver(post_save, sender=ExchangeProposal)
+def track_trade_want(sender, instance, created, **kwargs):
+    if created:
+        matching.proposal_created(instance)
+
+
+@receiver(post_save, sender=ExchangeProposal)
+def publish_proposal_event(sender, instance, created, **kwargs):
+    if not created and instance._loaded_status == instance.status:
+        return
+    events.publish(
+        events.proposal_event(
+            "proposal.created" if created else "proposal.status",
+            instance.pk,
+            instance.status,
+            instance.sender_user_id,
+            instance.receiver_user_id,
+        )
+    )
+    instance._loaded_status = instance.status
@@ -0,0 +1,162 @@
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db.models import Case, Count, F, Value, When
+
+from ads.models import Ad, ExchangeProposal, UserStats
+
+AWAITS = ExchangeProposal.ExchangeChoices.AWAITS
+FIELDS = ("ad_count", "pending_incoming", "pending_outgoing")
+
+
+def apply_deltas(deltas):
+    """
+    deltas: {user_id: Counter(поле=изменение)}. Все пользователи обновляются
+    одним UPDATE ... CASE, чтобы принятие предложения с конкурентами
+    не превращалось в запрос на каждого участника.
+    """
+    deltas = {
+        user_id: {field: delta for field, delta in changes.items() if delta}
+        for user_id, changes in deltas.items()
+        if user_id is not None
+    }
+    deltas = {user_id: changes for user_id, changes in deltas.items() if changes}
+    if not deltas:
+        return
+    values = {}
+    for field in FIELDS:
+        whens = [
+            When(user_id=user_id, then=Value(changes[field]))
+            for user_id, changes in deltas.items()
+            if field in changes
+        ]
+        if whens:
+            values[field] = F(field) + Case(*whens, default=Value(0))
+    updated = UserStats.objects.filter(user_id__in=list(deltas)).update(**values)
+    if updated < len(deltas):
+        # строк еще нет - считаем по данным, изменение в них уже учтено
+        existing = set(
+            UserStats.objects.filter(user_id__in=list(deltas)).values_list(
+                "user_id", flat=True
+            )
+        )
+        reconcile([user_id for user_id in deltas if user_id not in existing])
+
+
+def proposal_deltas(deltas, sender_user_id, receiver_user_id, delta):
+    deltas[sender_user_id]["pending_outgoing"] += delta
+    deltas[receiver_user_id]["pending_incoming"] += delta
+
+
+def ad_saved(ad, created):
+    if created:
+        apply_deltas({ad.user_id: Counter(ad_count=1)})
+
+
+def ad_deleted(ad, previous_user_id):
+    apply_deltas({previous_user_id: Counter(ad_count=-1)})
+
+
+def proposal_saved(proposal, created, previous_status, previous_users):
+    deltas = defaultdict(Counter)
+    if not created and previous_status == AWAITS:
+        proposal_deltas(deltas, *previous_users, -1)
+    if proposal.status == AWAITS:
+        proposal_deltas(deltas, proposal.sender_user_id, proposal.receiver_user_id, 1)
+    apply_deltas(deltas)
+
+
+def proposal_deleted(proposal, deleted_users=()):
+    if proposal.status == AWAITS:
+        deltas = defaultdict(Counter)
+        proposal_deltas(deltas, proposal.sender_user_id, proposal.receiver_user_id, -1)
+        for user_id in deleted_users:
+            deltas.pop(user_id, None)
+        apply_deltas(deltas)
+
+
+def proposals_closed(rows):
+    """rows: (sender_user_id, receiver_user_id) предложений, ушедших из ожидания"""
+    deltas = defaultdict(Counter)
+    for sender_user_id, receiver_user_id in rows:
+        proposal_deltas(deltas, sender_user_id, receiver_user_id, -1)
+    apply_deltas(deltas)
+
+
+def count_rows(user_ids):
+    counts = defaultdict(dict)
+    for field, queryset, user_field in (
+        ("ad_count", Ad.objects.all(), "user_id"),
+        (
+            "pending_incoming",
+            ExchangeProposal.objects.filter(status=AWAITS),
+            "receiver_user_id",
+        ),
+        (
+            "pending_outgoing",
+            ExchangeProposal.objects.filter(status=AWAITS),
+            "sender_user_id",
+        ),
+    ):
+        for user_id, total in (
+            queryset.filter(**{f"{user_field}__in": user_ids})
+            .values_list(user_field)
+            .annotate(total=Count("id"))
+            .order_by()
+        ):
+            counts[user_id][field] = total
+    return counts
+
+
+def reconcile(user_ids=None, batch_size=1000):
+    """
+    Пересчитывает счетчики по данным и исправляет расхождения.
+    Без user_ids - для всех пользователей. Возвращает число исправленных строк.
+    """
+    users = User.objects.order_by("pk").values_list("pk", flat=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=[user_id for user_id in user_ids if user_id])
+    users = users.iterator(chunk_size=batch_size)
+    fixed = 0
+    while batch := list(islice(users, batch_size)):
+        counts = count_rows(batch)
+        fixed += save_rows(
+            [UserStats(user_id=user_id, **counts[user_id]) for user_id in batch]
+        )
+    return fixed
+
+
+def save_rows(rows):
+    current = {
+        stats.user_id: stats
+        for stats in UserStats.objects.filter(user_id__in=[row.user_id for row in rows])
+    }
+    changed = [
+        row
+        for row in rows
+        if row.user_id not in current
+        or any(
+            getattr(row, field) != getattr(current[row.user_id], field)
+            for field in FIELDS
+        )
+    ]
+    UserStats.objects.bulk_create(
+        changed,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=FIELDS,
+    )
+    return len(changed)
+
+
+def get_user_stats(user):
+    if not user.is_authenticated:
+        return None
+    return UserStats.objects.filter(user_id=user.pk).first()
+
+
+async def aget_user_stats(user):
+    if not user.is_authenticated:
+        return None
+    return await UserStats.objects.filter(user_id=user.pk).afirst()
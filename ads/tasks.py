@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from ads import images, matching
+from ads.caching import bump_listing_version
+from ads.jobs import task
+from ads.models import Ad
+
+
+@task("ads.process_image")
+def process_image(name=None, previous=None):
+    if previous:
+        images.delete_thumbnails(previous)
+        Ad.objects.filter(image_url=previous).update(has_thumbnails=False)
+    if name:
+        images.generate_thumbnails(name)
+        # карточки с этим фото закешированы без превью - меняем их версию
+        Ad.objects.filter(image_url=name).update(
+            has_thumbnails=True, updated_at=timezone.now()
+        )
+        bump_listing_version()
+
+
+@task("ads.delete_image_derivatives")
+def delete_image_derivatives(name):
+    images.delete_thumbnails(name)
+    Ad.objects.filter(image_url=name).update(has_thumbnails=False)
+
+
+@task("ads.refresh_recommendations")
+def refresh_recommendations(user_id, cascade=False):
+    # изменения после этой точки поставят новую задачу
+    cache.delete(matching.pending_key(user_id, cascade))
+    matching.refresh_recommendations(user_id, cascade)
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.template import engines
+
+
+def template_names(app_label="ads"):
+    root = Path(apps.get_app_config(app_label).path) / "templates"
+    return sorted(path.relative_to(root).as_posix() for path in root.rglob("*.html"))
+
+
+def warm_up_templates(engine=None):
+    """
+    Загружает все шаблоны приложения, чтобы кеширующий загрузчик
+    скомпилировал их до первого запроса. Возвращает число шаблонов.
+    """
+    engine = engine or engines["django"]
+    names = template_names()
+    for name in names:
+        engine.get_template(name)
+    return len(names)
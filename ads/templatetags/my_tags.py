@@ -1,4 +1,8 @@
 from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from ads.images import THUMBNAIL_FORMATS, derivative_name, thumbnail_srcset
 
 register = template.Library()
 
@@ -22,3 +26,38 @@ def title_filter(title):
     if len(title) > 21:
         return f"{title[:18]}..."
     return title
+
+
+@register.simple_tag(takes_context=True)
+def query_string(context, **kwargs):
+    params = context["request"].GET.copy()
+    for key in ("page", "cursor"):
+        params.pop(key, None)
+    for key, value in kwargs.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+    return f"?{params.urlencode()}"
+
+
+@register.simple_tag
+def thumbnail(image, size, css_class="", alt=""):
+    # Наличие превью берется из флага объявления, без обращения к хранилищу
+    name = getattr(image, "name", image)
+    ready = getattr(getattr(image, "instance", None), "has_thumbnails", False)
+    if not name or not ready:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}">', media_filter(name), alt, css_class
+        )
+    _, webp_type = THUMBNAIL_FORMATS["webp"]
+    return format_html(
+        '<picture><source type="{}" srcset="{}">'
+        '<img src="{}" srcset="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        webp_type,
+        thumbnail_srcset(name, size, "webp"),
+        default_storage.url(derivative_name(name, size, 1, "jpg")),
+        thumbnail_srcset(name, size, "jpg"),
+        alt,
+        css_class,
+    )
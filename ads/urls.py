@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.contrib.auth.views import LogoutView
 from django.urls import path, reverse_lazy
 
 from ads.apps import AdsConfig
+from ads.async_views import (
+    AsyncAdDetailView,
+    AsyncAdListView,
+    AsyncExchangeProposalListView,
+    ProposalEventsView,
+)
 from ads.views import (
     BaseView,
     AdCreateView,
@@ -13,11 +20,23 @@ from ads.views import (
     ExchangeProposalCreateView,
     ExchangeProposalListView,
     ExchangeProposalDetailView,
-    AdDeleteView, accept_proposal, reject_proposal,
+    AdDeleteView,
+    accept_proposal,
+    reject_proposal,
+    AdImportView,
+    AdExportView,
+    AdLookupView,
+    SwapRecommendationListView,
 )
 
 app_name = AdsConfig.name
 
+
+def pick(sync_view, async_view):
+    """Под ASGI списки и карточка объявления обслуживаются async-представлениями."""
+    return async_view if settings.ASYNC_VIEWS else sync_view
+
+
 urlpatterns = [
     path("", BaseView.as_view(), name="home", kwargs={"template_name": "base.html"}),
     path("ad_create/", AdCreateView.as_view(), name="ad_create"),
@@ -34,9 +53,16 @@ urlpatterns = [
         LogoutView.as_view(next_page=reverse_lazy("ads:login")),
         name="logout",
     ),
-    path("ad_list/", AdListView.as_view(), name="ad_list"),
+    path("ad_list/", pick(AdListView, AsyncAdListView).as_view(), name="ad_list"),
+    path("ad_import/", AdImportView.as_view(), name="ad_import"),
+    path("ad_export/", AdExportView.as_view(), name="ad_export"),
     path("<int:pk>/ad_update", AdUpdateView.as_view(), name="ad_update"),
-    path("ad_detail/<int:pk>", AdDetailView.as_view(), name="ad_detail"),
+    path(
+        "ad_detail/<int:pk>",
+        pick(AdDetailView, AsyncAdDetailView).as_view(),
+        name="ad_detail",
+    ),
+    path("ad_lookup/", AdLookupView.as_view(), name="ad_lookup"),
     path("<int:pk>/ad_delete", AdDeleteView.as_view(), name="ad_delete"),
     path(
         "exchange_proposal_create/<int:pk>",
@@ -45,14 +71,24 @@ urlpatterns = [
     ),
     path(
         "exchange_proposal_list",
-        ExchangeProposalListView.as_view(),
+        pick(ExchangeProposalListView, AsyncExchangeProposalListView).as_view(),
         name="exchange_proposal_list",
     ),
+    path(
+        "exchange_proposal_events",
+        ProposalEventsView.as_view(),
+        name="exchange_proposal_events",
+    ),
     path(
         "exchange_proposal_detail/<int:pk>",
         ExchangeProposalDetailView.as_view(),
         name="exchange_proposal_detail",
     ),
-    path('proposal/<int:proposal_id>/accept/', accept_proposal, name='accept_proposal'),
-    path('proposal/<int:proposal_id>/reject/', reject_proposal, name='reject_proposal'),
+    path(
+        "swap_recommendations/",
+        SwapRecommendationListView.as_view(),
+        name="swap_recommendations",
+    ),
+    path("proposal/<int:proposal_id>/accept/", accept_proposal, name="accept_proposal"),
+    path("proposal/<int:proposal_id>/reject/", reject_proposal, name="reject_proposal"),
 ]
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.views.generic import (
+    FormView,
     TemplateView,
     CreateView,
     ListView,
@@ -10,40 +14,113 @@ from django.views.generic import (
     DetailView,
     DeleteView,
 )
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F
 
+from ads.bulk import export_ads, guess_format, import_ads
 from ads.forms import (
     AdForm,
+    AdImportForm,
     CustomRegistrationForm,
     CustomLoginForm,
     ExchangeProposalForm,
 )
-from ads.models import Ad, ExchangeProposal
+from ads import matching, permissions, services
+from ads.caching import CachedResponseMixin
+from ads.facets import get_facets
+from ads.models import Ad, ExchangeProposal, SwapRecommendation
+from ads.paginators import CursorPaginator, EstimatedCountPaginator
+from ads.search import get_search_backend
+from ads.services import TransitionResult
 from django.contrib.auth.views import LoginView
 
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse_lazy
 
 
+class AtomicFormMixin:
+    """
+    Запись объекта и обновление счетчиков в сигналах post_save/post_delete
+    идут в одной транзакции: при ошибке не остается расхождений.
+    """
+
+    def form_valid(self, form):
+        with transaction.atomic():
+            return super().form_valid(form)
+
+
 class OwnerMixin(LoginRequiredMixin):
+    """
+    Объект загружается один раз в dispatch вместе с проверкой владельца,
+    get_object отдает его представлению без повторного запроса.
+    """
+
+    owner_field = "user_id"
+
     def dispatch(self, request, *args, **kwargs):
-        try:
-            self.ad = get_object_or_404(Ad, pk=kwargs["pk"])
-        except Ad.DoesNotExist:
-            messages.error(request, "Объявление не найдено")
-            return redirect("ads:ad_list")
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
 
-        if self.ad.user != request.user:
+        self.object, outcome = permissions.get_owned(
+            self.get_queryset(), kwargs["pk"], request.user, self.owner_field
+        )
+        if outcome == permissions.NOT_FOUND:
+            raise Http404("Объявление не найдено")
+        if outcome == permissions.FORBIDDEN:
             messages.error(request, "У вас нет прав на редактирование этого объявления")
             return redirect("ads:ad_list")
 
         return super().dispatch(request, *args, **kwargs)
 
+    def get_object(self, queryset=None):
+        return self.object
+
+
+class ListPaginationMixin:
+    """
+    Один проход по списку: отфильтрованный queryset строится один раз,
+    затем один COUNT (или ни одного в курсорном режиме) и одна выборка страницы.
+    """
+
+    cursor_ordering = ("-created_at", "-id")
+
+    def use_cursor_pagination(self):
+        return settings.CURSOR_PAGINATION
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        if settings.PAGINATION_ESTIMATE_COUNT:
+            return EstimatedCountPaginator(queryset, per_page, **kwargs)
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.use_cursor_pagination():
+            paginator = CursorPaginator(
+                queryset,
+                page_size,
+                ordering=self.cursor_ordering,
+                estimate=settings.PAGINATION_ESTIMATE_COUNT,
+            )
+            page = paginator.page(self.request.GET.get("cursor"))
+        else:
+            paginator = self.get_paginator(queryset, page_size)
+            # get_page сам возвращает первую/последнюю страницу при неверном номере
+            page = paginator.get_page(self.request.GET.get(self.page_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["ads"] = context["page_obj"]
+        context["cursor_pagination"] = self.use_cursor_pagination()
+        context["show_estimated_count"] = settings.PAGINATION_ESTIMATE_COUNT
+        return context
 
-class BaseView(TemplateView):
+
+class BaseView(CachedResponseMixin, TemplateView):
     template_name = "ads/base.html"
+    # строка поиска в меню выводит q обратно в страницу
+    cache_params = ("q",)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -73,84 +150,90 @@ class CustomLoginView(LoginView):
         return self.success_url
 
 
-class AdCreateView(LoginRequiredMixin, CreateView):
+class AdCreateView(LoginRequiredMixin, AtomicFormMixin, CreateView):
     model = Ad
     form_class = AdForm
     success_url = reverse_lazy("ads:home")
 
     def form_valid(self, form):
-        self.object = form.save()
-        self.object.user = self.request.user
-        self.object.save()
         form.instance.user = self.request.user
         return super().form_valid(form)
 
 
-class AdListView(ListView):
+class AdImportView(LoginRequiredMixin, FormView):
+    form_class = AdImportForm
+    template_name = "ads/ad_import.html"
+
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        result = import_ads(
+            upload.file,
+            self.request.user,
+            format=form.cleaned_data["format"] or guess_format(upload.name),
+        )
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
+class AdExportView(LoginRequiredMixin, View):
+    content_types = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get("format")
+        if format not in self.content_types:
+            format = "csv"
+        response = StreamingHttpResponse(
+            export_ads(format),
+            content_type=f"{self.content_types[format]}; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="ads.{format}"'
+        return response
+
+
+def filter_ads(queryset, params):
+    query = params.get("q")
+    category = params.get("category")
+    condition = params.get("condition")
+    if query:
+        queryset = get_search_backend().search(queryset, query)
+    if category:
+        queryset = queryset.filter(category=category)
+    if condition:
+        queryset = queryset.filter(condition=condition)
+    return queryset
+
+
+class AdListView(CachedResponseMixin, ListPaginationMixin, ListView):
     model = Ad
     paginate_by = 10
+    ordering = ("-created_at", "-id")
+    cache_params = ("q", "category", "condition", "page", "cursor")
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        query = self.request.GET.get("q")
-        category = self.request.GET.get("category")
-        condition = self.request.GET.get("condition")
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
-            )
-        if category:
-            queryset = queryset.filter(category=category)
-        if condition:
-            queryset = queryset.filter(condition=condition)
-
-        return queryset
+        return filter_ads(super().get_queryset(), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context["categories"] = (
-            Ad.objects.order_by("category")
-            .values_list("category", flat=True)
-            .distinct()
-        )
+        facets = get_facets()
+        context["categories"] = facets["categories"]
+        context["condition_counts"] = facets["conditions"]
 
         context["selected_category"] = self.request.GET.get("category")
+        context["selected_condition"] = self.request.GET.get("condition")
         context["selected_status"] = self.request.GET.get("status")
-        page = self.request.GET.get("page")
-        paginator = Paginator(self.get_queryset(), self.paginate_by)
-        try:
-            ads = paginator.page(page)
-        except PageNotAnInteger:
-            ads = paginator.page(1)
-        except EmptyPage:
-            ads = paginator.page(paginator.num_pages)
-
-        context["ads"] = ads
-        context["paginator"] = paginator
-
         return context
 
 
-class AdUpdateView(OwnerMixin, UpdateView):
+class AdUpdateView(OwnerMixin, AtomicFormMixin, UpdateView):
     model = Ad
     form_class = AdForm
     success_url = reverse_lazy("ads:home")
 
 
-class AdDeleteView(OwnerMixin, DeleteView):
+class AdDeleteView(OwnerMixin, AtomicFormMixin, DeleteView):
     model = Ad
     success_url = reverse_lazy("ads:home")
 
-    def dispatch(self, request, *args, **kwargs):
-        try:
-            self.object = self.get_object()
-            return super().dispatch(request, *args, **kwargs)
-
-        except self.model.DoesNotExist:
-            messages.error(request, "Объект не найден")
-            return redirect(self.success_url)
-
     def delete(self, request, *args, **kwargs):
         response = super().delete(request, *args, **kwargs)
         messages.success(request, "Объявление успешно удалено")
@@ -161,7 +244,7 @@ class AdDetailView(LoginRequiredMixin, DetailView):
     model = Ad
 
 
-class ExchangeProposalCreateView(CreateView):
+class ExchangeProposalCreateView(AtomicFormMixin, CreateView):
     model = ExchangeProposal
     form_class = ExchangeProposalForm
     success_url = reverse_lazy("ads:home")
@@ -175,78 +258,120 @@ class ExchangeProposalCreateView(CreateView):
         initial = super().get_initial()
         user_ad = Ad.objects.get(id=self.kwargs["pk"])
         initial["ad_receiver"] = user_ad
+        # из рекомендаций обмена приходит и свое объявление
+        if self.request.GET.get("ad_sender", "").isdigit():
+            initial["ad_sender"] = self.request.GET["ad_sender"]
         return initial
 
 
-class ExchangeProposalListView(ListView):
-    model = ExchangeProposal
-    context_object_name = "proposals"
-    paginate_by = 5
+class AdLookupView(LoginRequiredMixin, View):
+    """Подсказки для выбора чужого объявления по началу названия."""
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        user = self.request.user
-        sender_id = self.request.GET.get("sender")
-        receiver_id = self.request.GET.get("receiver")
-        status = self.request.GET.get("status")
-        queryset = queryset.filter(Q(ad_receiver__user=user) | Q(ad_sender__user=user))
+    def get(self, request, *args, **kwargs):
+        ads = (
+            Ad.objects.exclude(user=request.user)
+            .filter(title__istartswith=request.GET.get("q", "").strip())
+            .values("id", "title")[: settings.AD_LOOKUP_LIMIT]
+        )
+        return JsonResponse({"results": list(ads)})
 
-        if sender_id:
-            queryset = queryset.filter(ad_sender__user_id=sender_id)
 
-        if receiver_id:
-            queryset = queryset.filter(ad_receiver__user_id=receiver_id)
+def filter_proposals(queryset, params):
+    queryset = queryset.select_related("ad_sender__user", "ad_receiver__user")
+    sender_id = params.get("sender")
+    receiver_id = params.get("receiver")
+    status = params.get("status")
 
-        if status:
-            queryset = queryset.filter(status=status)
+    if sender_id:
+        queryset = queryset.filter(sender_user_id=sender_id)
 
-        return queryset
+    if receiver_id:
+        queryset = queryset.filter(receiver_user_id=receiver_id)
 
-    def get_context_data(self, *args, **kwargs):
-        context_data = super().get_context_data(*args, **kwargs)
-        ads_user = ExchangeProposal.objects.filter(
-            Q(ad_sender__user=self.request.user)
-            | Q(ad_receiver__user=self.request.user)
+    if status:
+        queryset = queryset.filter(status=status)
+
+    return queryset
+
+
+def proposal_participants(user, user_field):
+    return (
+        ExchangeProposal.objects.for_user(user)
+        .values(user_id=F(f"{user_field}_id"), username=F(f"{user_field}__username"))
+        .distinct()
+        .order_by("username")
+    )
+
+
+class ExchangeProposalListView(LoginRequiredMixin, ListPaginationMixin, ListView):
+    model = ExchangeProposal
+    context_object_name = "proposals"
+    paginate_by = 5
+    ordering = ("-created_at", "-id")
+
+    def get_queryset(self):
+        return filter_proposals(
+            super().get_queryset().for_user(self.request.user), self.request.GET
         )
 
+    def get_context_data(self, *args, **kwargs):
+        context_data = super().get_context_data(*args, **kwargs)
         context_data["status_choices"] = ExchangeProposal.ExchangeChoices.choices
+        context_data["senders"] = self.get_participants("sender_user")
+        context_data["receivers"] = self.get_participants("receiver_user")
 
         context_data["selected_sender"] = self.request.GET.get("sender")
         context_data["selected_receiver"] = self.request.GET.get("receiver")
         context_data["selected_status"] = self.request.GET.get("status")
-
-        context_data["object_list"] = ads_user
-        page = self.request.GET.get("page")
-        paginator = Paginator(self.get_queryset(), self.paginate_by)
-        try:
-            ads = paginator.page(page)
-        except PageNotAnInteger:
-            ads = paginator.page(1)
-        except EmptyPage:
-            ads = paginator.page(paginator.num_pages)
-
-        context_data["ads"] = ads
-        context_data["paginator"] = paginator
+        context_data["proposal_events"] = isinstance(self.request, ASGIRequest)
         return context_data
 
+    def get_participants(self, user_field):
+        return proposal_participants(self.request.user, user_field)
+
+
+class SwapRecommendationListView(LoginRequiredMixin, ListView):
+    """Подобранные обмены: читаются из готового индекса, пересчет - в воркере."""
+
+    context_object_name = "recommendations"
+
+    def get_queryset(self):
+        matching.ensure_fresh(self.request.user.pk)
+        return (
+            SwapRecommendation.objects.filter(user=self.request.user)
+            .select_related("give_ad", "get_ad", "partner", "third")
+            .order_by("-score", "pk")
+        )
+
 
 class ExchangeProposalDetailView(DetailView):
-    model = ExchangeProposal
+    queryset = ExchangeProposal.objects.select_related(
+        "ad_sender__user", "ad_receiver__user"
+    )
+
+
+TRANSITION_MESSAGES = {
+    TransitionResult.NOT_FOUND: "Предложение не найдено",
+    TransitionResult.FORBIDDEN: "Ответить может только получатель предложения",
+    TransitionResult.CONFLICT: "Предложение уже рассмотрено",
+}
+
+
+def finish_transition(request, result):
+    if not result.applied:
+        messages.error(request, TRANSITION_MESSAGES[result.outcome])
+    return redirect("ads:exchange_proposal_list")
 
 
 @login_required
 def accept_proposal(request, proposal_id):
-    proposal = get_object_or_404(ExchangeProposal, id=proposal_id)
-    if request.user == proposal.ad_receiver.user:
-        proposal.status = ExchangeProposal.ExchangeChoices.TAKEN
-        proposal.save()
-    return redirect("ads:exchange_proposal_list")
+    return finish_transition(
+        request, services.accept_proposal(proposal_id, request.user)
+    )
 
 
 @login_required
 def reject_proposal(request, proposal_id):
-    proposal = get_object_or_404(ExchangeProposal, id=proposal_id)
-    if request.user == proposal.ad_receiver.user:
-        proposal.status = ExchangeProposal.ExchangeChoices.REJECTED
-        proposal.save()
-    return redirect("ads:exchange_proposal_list")
+    return finish_transition(
+        request, services.reject_proposal(proposal_id, request.user)
+    )
@@ -16,9 +16,9 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DEBUG", "True") == "True"
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
 
 # Application definition
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "ads.middleware.PerformanceMiddleware",
+    "ads.middleware.ResponseCacheMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -45,24 +47,51 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "config.urls"
 
+# Вне DEBUG шаблоны компилируются один раз на процесс и не перечитываются
+# с диска; в DEBUG загрузка без кеша, чтобы правки шаблонов были видны сразу
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+if (os.getenv("CACHED_TEMPLATES") or str(not DEBUG)) == "True":
+    TEMPLATE_LOADERS = [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates с учетом времени отрисовки (ads.metrics)
+        "BACKEND": "ads.metrics.InstrumentedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "ads.context_processors.fragment_cache",
+                "ads.context_processors.user_stats",
             ],
+            "loaders": TEMPLATE_LOADERS,
         },
     },
 ]
 
+# Прогрев кеша шаблонов при запуске wsgi/asgi (см. ads.template_cache)
+TEMPLATE_WARMUP = (os.getenv("TEMPLATE_WARMUP") or str(not DEBUG)) == "True"
+
 WSGI_APPLICATION = "config.wsgi.application"
 
-MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
+# Async-версии представлений списков и карточки объявления (ads.async_views).
+# config/asgi.py включает их по умолчанию, под WSGI работают синхронные
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
+
+# Поиск по объявлениям: по умолчанию PostgreSQL full-text,
+# на других СУБД - инвертированный индекс в памяти процесса
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND")
+
+# Пагинация списков: курсорная (keyset) вместо OFFSET
+# и оценка количества строк по плану запроса вместо COUNT(*)
+CURSOR_PAGINATION = os.getenv("CURSOR_PAGINATION", "False") == "True"
+PAGINATION_ESTIMATE_COUNT = os.getenv("PAGINATION_ESTIMATE_COUNT", "False") == "True"
 
 
 # Database
@@ -76,9 +105,95 @@ DATABASES = {
         "PORT": os.getenv("PORT"),
         "USER": os.getenv("USER"),
         "PASSWORD": os.getenv("PASSWORD"),
+        # Постоянные соединения вместо нового подключения на каждый запрос.
+        # Под ASGI с async-представлениями Django советует их отключать:
+        # соединения остаются в потоках sync_to_async
+        "CONN_MAX_AGE": int(
+            os.getenv("CONN_MAX_AGE") or (0 if DEBUG or ASYNC_VIEWS else 60)
+        ),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND")
+        or "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    },
+    # Отдельно от кеша страниц: его очистка не сбрасывает сессии.
+    # Без SESSION_CACHE_BACKEND - память процесса (разработка и тесты)
+    "sessions": {
+        "BACKEND": os.getenv("SESSION_CACHE_BACKEND")
+        or "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": os.getenv("SESSION_CACHE_LOCATION", "sessions"),
+    },
+}
+
+# Сессии читаются из кеша, в БД пишутся только измененные (cached_db);
+# signed_cookies обходится без хранилища вовсе. Сообщения хранятся в
+# подписанной cookie, в сессию попадают лишь не поместившиеся в нее
+SESSION_ENGINE = os.getenv(
+    "SESSION_ENGINE", "django.contrib.sessions.backends.cached_db"
+)
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_SAVE_EVERY_REQUEST = False
+MESSAGE_STORAGE = os.getenv(
+    "MESSAGE_STORAGE", "django.contrib.messages.storage.fallback.FallbackStorage"
+)
+
+# Счетчики категорий и состояний для фильтра списка объявлений
+FACETS_CACHE_TIMEOUT = int(os.getenv("FACETS_CACHE_TIMEOUT", 600))
+
+# Кеш готовых страниц для анонимных пользователей, сек (0 - отключен)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 60))
+
+# Кеш карточек объявлений и предложений в списках, сек.
+# Ключ включает updated_at объектов, поэтому измененные карточки
+# перерисовываются сразу, а срок лишь ограничивает размер кеша
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", 86400))
+
+# События предложений (SSE): на PostgreSQL через LISTEN/NOTIFY,
+# иначе в памяти процесса. Интервалы в секундах
+EVENTS_BROKER = os.getenv("EVENTS_BROKER")
+SSE_KEEPALIVE = int(os.getenv("SSE_KEEPALIVE", 15))
+SSE_RETRY = int(os.getenv("SSE_RETRY", 5))
+
+# Метрики запросов (ads.middleware): заголовок Server-Timing, /metrics
+# в формате Prometheus и предупреждения в лог ads.performance для запросов
+# сверх бюджета. METRICS_TOKEN закрывает /metrics по Bearer-токену,
+# без него /metrics доступен только в DEBUG
+SERVER_TIMING = os.getenv("SERVER_TIMING", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+PERF_QUERY_BUDGET = int(os.getenv("PERF_QUERY_BUDGET", 20))
+PERF_LATENCY_BUDGET_MS = int(os.getenv("PERF_LATENCY_BUDGET_MS", 500))
+
+# Подбор обменов (ads.matching): сколько кандидатов рассматривать с каждой
+# стороны, сколько рекомендаций хранить, срок их жизни и задержка пересчета
+# после изменений пользователя, сек
+MATCHING_FANOUT = int(os.getenv("MATCHING_FANOUT", 200))
+MATCHING_LIMIT = int(os.getenv("MATCHING_LIMIT", 20))
+MATCHING_TTL = int(os.getenv("MATCHING_TTL", 3600))
+MATCHING_DELAY = int(os.getenv("MATCHING_DELAY", 30))
+
+# Подсказки при выборе объявления в форме предложения: не больше
+# AD_LOOKUP_LIMIT объявлений по началу названия
+AD_LOOKUP_LIMIT = int(os.getenv("AD_LOOKUP_LIMIT", 20))
+
+# Импорт объявлений через сайт идет в запросе: предельный размер файла
+# в байтах и число строк. Команда import_ads не ограничена
+AD_IMPORT_MAX_SIZE = int(os.getenv("AD_IMPORT_MAX_SIZE", 5 * 1024 * 1024))
+AD_IMPORT_MAX_LINES = int(os.getenv("AD_IMPORT_MAX_LINES", 5000))
+
+# Фоновые задачи (ads.jobs): воркер запускается командой run_worker.
+# JOBS_EAGER выполняет задачи сразу после коммита, без воркера
+JOBS_EAGER = os.getenv("JOBS_EAGER", "False") == "True"
+JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", 10))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_BACKOFF_BASE = int(os.getenv("JOBS_BACKOFF_BASE", 5))
+JOBS_BACKOFF_MAX = int(os.getenv("JOBS_BACKOFF_MAX", 3600))
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", 600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -4,10 +4,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.defaults import server_error
 
+from ads.metrics import metrics_view
+
 handler404 = 'config.views.pageNotFound'
 handler500 = server_error
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
+    path("api/v1/", include("ads.api_urls", namespace="api")),
     path("", include("ads.urls", namespace="ads")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)